@@ -1,6 +1,23 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AuthAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auth_app'
+
+    def ready(self):
+        # send queued mail (including whatever was left over from the last run) without waiting for a request
+        if not getattr(settings, "EMAIL_OUTBOX_WORKER", True):
+            return
+        # manage.py commands other than runserver don't serve requests; drain_outbox covers them
+        if os.path.basename(sys.argv[0]) == "manage.py" and sys.argv[1:2] != ["runserver"]:
+            return
+        # gunicorn preloads the app in the master, the thread is started in each worker after the fork instead
+        if os.getenv("GUNICORN_PRELOAD_APP") == "1":
+            return
+        from .mail_queue import dispatcher
+        dispatcher.start()
@@ -0,0 +1,140 @@
+# auth_app/mail_queue.py
+
+import datetime
+import logging
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# how long a worker may hold a message before another worker may pick it up again
+LEASE = datetime.timedelta(minutes=5)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2*base, 4*base... capped at one hour."""
+    base = _setting("EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30)
+    return datetime.timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def enqueue_mail(subject, message, from_email, recipient_list):
+    """Store an email in the outbox and wake the dispatcher; returns immediately."""
+    email = OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email,
+        recipients=list(recipient_list),
+    )
+    if _setting("EMAIL_OUTBOX_WORKER", True):
+        dispatcher.wake()
+    return email
+
+
+def _claim(email):
+    # only one worker wins the update; the lease expires if that worker dies mid-send
+    return OutboundEmail.objects.filter(
+        pk=email.pk, status=OutboundEmail.PENDING, next_attempt_at=email.next_attempt_at,
+    ).update(next_attempt_at=timezone.now() + LEASE) == 1
+
+
+def drain_outbox(batch_size=None, connection=None):
+    """Send due messages over one reused SMTP connection.
+
+    Returns a dict with the number of messages sent, retried and failed.
+    """
+    batch_size = batch_size or _setting("EMAIL_OUTBOX_BATCH_SIZE", 50)
+    max_attempts = _setting("EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+    counts = {"sent": 0, "retried": 0, "failed": 0}
+
+    due = list(
+        OutboundEmail.objects.filter(status=OutboundEmail.PENDING, next_attempt_at__lte=timezone.now())
+        .order_by("next_attempt_at")[:batch_size]
+    )
+    if not due:
+        return counts
+
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        for email in due:
+            if not _claim(email):
+                continue
+
+            message = EmailMessage(email.subject, email.body, email.from_email, email.recipients, connection=connection)
+            try:
+                # opens the connection on first use and keeps it open for the rest of the batch
+                connection.open()
+                connection.send_messages([message])
+            except Exception as e:
+                # the connection may be unusable now, the next message reconnects
+                connection.close()
+                email.attempts += 1
+                email.last_error = str(e)
+                if email.attempts >= max_attempts:
+                    email.status = OutboundEmail.FAILED
+                    email.body = ""
+                    counts["failed"] += 1
+                else:
+                    email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                    counts["retried"] += 1
+                email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at", "body"])
+                continue
+
+            email.attempts += 1
+            email.status = OutboundEmail.SENT
+            email.sent_at = timezone.now()
+            email.last_error = ""
+            # the body may carry an OTP; don't keep it around once delivered (prune_otps deletes the row)
+            email.body = ""
+            email.save(update_fields=["attempts", "status", "sent_at", "last_error", "body"])
+            counts["sent"] += 1
+    finally:
+        connection.close()
+    return counts
+
+
+class MailDispatcher:
+    """Background thread that drains the outbox when woken and every poll interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        """Start the thread if it isn't running (threads don't survive a fork, so call again in the child)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mail-dispatcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(timeout=_setting("EMAIL_OUTBOX_POLL_SECONDS", 30))
+            self._wakeup.clear()
+            try:
+                # keep draining while full batches come back
+                while sum(drain_outbox().values()) >= _setting("EMAIL_OUTBOX_BATCH_SIZE", 50):
+                    pass
+            except Exception as e:
+                logger.exception("outbox drain failed: %s", e)
+            finally:
+                close_old_connections()
+
+
+dispatcher = MailDispatcher()
@@ -0,0 +1,88 @@
+import json
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from auth_app.models import PasswordResetOTP
+
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+class Command(BaseCommand):
+    help = ("Measure the OTP lookups used by the password-reset views as the table grows. "
+            "Runs against a throwaway test database, never the real one.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated table sizes")
+        parser.add_argument("--repeat", type=int, default=200, help="lookups timed per size")
+        parser.add_argument("--without-index", action="store_true", help="drop the composite index to compare")
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            if options["without_index"]:
+                with connection.schema_editor() as editor:
+                    for index in PasswordResetOTP._meta.indexes:
+                        editor.remove_index(PasswordResetOTP, index)
+            results = self._run(sizes, options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options["json"]:
+            self.stdout.write(json.dumps({"indexed": not options["without_index"], "results": results}, indent=2))
+            return
+        self.stdout.write(f"{'rows':>10}  {'latest() us':>12}  {'unused exists() us':>18}")
+        for row in results:
+            self.stdout.write(f"{row['rows']:>10}  {row['latest_us']:>12.1f}  {row['unused_exists_us']:>18.1f}")
+
+    def _run(self, sizes, repeat):
+        rng = random.Random(42)
+        results = []
+        inserted = 0
+        emails = []
+        for size in sizes:
+            # about three OTPs per address, most of them already used, like a long-running table
+            batch = []
+            while inserted < size:
+                email = f"user{inserted // 3}@example.com"
+                if inserted % 3 == 0:
+                    emails.append(email)
+                otp = "".join(rng.choices(string.digits, k=6))
+                batch.append(PasswordResetOTP(email=email, otp=otp, is_used=inserted % 3 != 2))
+                inserted += 1
+                if len(batch) == 50000:
+                    PasswordResetOTP.objects.bulk_create(batch)
+                    batch = []
+            PasswordResetOTP.objects.bulk_create(batch)
+
+            def latest():
+                email = rng.choice(emails)
+                try:
+                    PasswordResetOTP.objects.filter(email=email, otp="000000", is_used=False).latest("created_at")
+                except PasswordResetOTP.DoesNotExist:
+                    pass
+
+            def unused_exists():
+                # same WHERE clause as the delete() in send_otp_reset_password
+                PasswordResetOTP.objects.filter(email=rng.choice(emails), is_used=False).exists()
+
+            results.append({
+                "rows": size,
+                "latest_us": round(_timed(latest, repeat), 1),
+                "unused_exists_us": round(_timed(unused_exists, repeat), 1),
+            })
+        return results
@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.test import RequestFactory, override_settings
+
+from auth_app.ratelimit import MemoryStore, rate_limit
+
+
+def _per_call_ns(fn, iterations):
+    start = time.perf_counter_ns()
+    for i in range(iterations):
+        fn(i)
+    return (time.perf_counter_ns() - start) / iterations
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request overhead of the auth rate limiter (in-process store)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200000)
+        parser.add_argument("--keys", type=int, default=10000, help="distinct clients to spread requests over")
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        n = options["iterations"]
+        keys = [f"bench:ip:10.0.{i // 256}.{i % 256}" for i in range(options["keys"])]
+
+        store = MemoryStore()
+        results = {
+            # plenty of tokens: every hit is allowed
+            "store_allowed_ns": _per_call_ns(lambda i: store.hit(keys[i % len(keys)], 10 ** 9, 1), n),
+        }
+        store = MemoryStore()
+        store.hit("bench:flood", 1, 3600)
+        results["store_rejected_ns"] = _per_call_ns(lambda i: store.hit("bench:flood", 1, 3600), n)
+
+        # whole decorator around a trivial view, with and without a limit configured
+        factory = RequestFactory()
+        requests = [
+            factory.post("/", data=json.dumps({"email": f"user{i}@example.com"}), content_type="application/json",
+                         REMOTE_ADDR=f"10.1.{i // 256 % 256}.{i % 256}")
+            for i in range(min(n, 1000))
+        ]
+        view = lambda request: JsonResponse({"success": True})
+        limited = rate_limit("bench")(view)
+        requests_n = min(n, 20000)
+        with override_settings(AUTH_RATE_LIMITS={"bench": {"ip": f"{10 ** 9}/s", "email": f"{10 ** 9}/s"}}):
+            results["view_unlimited_ns"] = _per_call_ns(lambda i: view(requests[i % len(requests)]), requests_n)
+            results["view_limited_ns"] = _per_call_ns(lambda i: limited(requests[i % len(requests)]), requests_n)
+        with override_settings(AUTH_RATE_LIMITS={"bench": {"ip": "1/h"}}):
+            limited(requests[0])
+            results["view_rejected_ns"] = _per_call_ns(lambda i: limited(requests[0]), requests_n)
+        results["decorator_overhead_ns"] = results["view_limited_ns"] - results["view_unlimited_ns"]
+
+        results = {name: round(value, 1) for name, value in results.items()}
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, value in results.items():
+            self.stdout.write(f"{name:>24}: {value / 1000:8.2f} us")
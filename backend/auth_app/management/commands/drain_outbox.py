@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auth_app.mail_queue import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Send queued emails from the outbox (use --loop to keep running as a worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--loop", action="store_true", help="keep polling instead of exiting when the outbox is empty")
+        parser.add_argument("--interval", type=float, default=5.0, help="seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = drain_outbox(batch_size=options["batch_size"])
+            if any(counts.values()):
+                self.stdout.write(f"sent {counts['sent']}, retrying {counts['retried']}, failed {counts['failed']}")
+            elif not options["loop"]:
+                break
+            else:
+                time.sleep(options["interval"])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auth_app.models import OutboundEmail, PasswordResetOTP
+
+
+class Command(BaseCommand):
+    help = "Delete used and expired password-reset OTPs and delivered outbox emails in chunks (run periodically, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--loop", action="store_true", help="keep sweeping every --interval seconds")
+        parser.add_argument("--interval", type=float, default=600.0)
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = PasswordResetOTP.prune_expired(chunk_size=options["chunk_size"])
+            self.stdout.write(f"deleted {deleted} expired OTP(s)")
+            deleted = OutboundEmail.prune_finished(chunk_size=options["chunk_size"])
+            self.stdout.write(f"deleted {deleted} sent or failed email(s)")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0002_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='passwordresetotp',
+            index=models.Index(fields=['email', 'is_used', 'created_at'], name='otp_email_used_created_idx'),
+        ),
+    ]
@@ -1,13 +1,70 @@
+import datetime
+
 from django.db import models
 from django.utils import timezone
 
+# OTP valid for 10 minutes
+OTP_VALID_SECONDS = 600
+
+def _delete_in_chunks(queryset, chunk_size):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=ids).delete()[0]
+
+
 # Create your models here.
 class PasswordResetOTP(models.Model):
     email = models.EmailField()
     otp = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
     is_used = models.BooleanField(default=False)
+
+    class Meta:
+        # serves both filter(email, is_used=False) in the views and .latest('created_at')
+        indexes = [models.Index(fields=['email', 'is_used', 'created_at'], name='otp_email_used_created_idx')]
     
     def is_valid(self):
-        # OTP valid for 10 minutes
-        return not self.is_used and (timezone.now() - self.created_at).total_seconds() < 600
+        return not self.is_used and (timezone.now() - self.created_at).total_seconds() < OTP_VALID_SECONDS
+
+    @classmethod
+    def prune_expired(cls, chunk_size=1000):
+        """Delete used and expired OTPs in chunks so no single statement locks the table for long.
+
+        Returns the number of deleted rows.
+        """
+        cutoff = timezone.now() - datetime.timedelta(seconds=OTP_VALID_SECONDS)
+        return _delete_in_chunks(cls.objects.filter(models.Q(is_used=True) | models.Q(created_at__lt=cutoff)), chunk_size)
+
+
+# outgoing email waiting to be delivered by auth_app.mail_queue
+class OutboundEmail(models.Model):
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # also used as a lease: a worker pushes it forward while it is sending the message
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    @classmethod
+    def prune_finished(cls, chunk_size=1000):
+        """Delete sent and failed messages (their bodies may hold OTPs) in chunks.
+
+        Returns the number of deleted rows.
+        """
+        return _delete_in_chunks(cls.objects.filter(status__in=[cls.SENT, cls.FAILED]), chunk_size)
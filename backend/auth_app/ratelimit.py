@@ -0,0 +1,153 @@
+# auth_app/ratelimit.py
+
+import functools
+import json
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+PERIOD_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """"5/10m" -> (5, 600.0): at most 5 requests per 10 minutes."""
+    count, period = rate.split("/")
+    unit = period[-1]
+    multiplier = float(period[:-1]) if len(period) > 1 else 1.0
+    return int(count), multiplier * PERIOD_SECONDS[unit]
+
+
+class MemoryStore:
+    """In-process token buckets: each key refills ``limit`` tokens per ``period``."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> [tokens, last_refill]
+
+    def hit(self, key, limit, period):
+        """Take one token; returns (allowed, retry_after_seconds)."""
+        now = time.monotonic()
+        rate = limit / period
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._evict()
+                bucket = self._buckets[key] = [float(limit), now]
+            else:
+                bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0
+            return False, (1 - bucket[0]) / rate
+
+    def _evict(self):
+        # the oldest half by insertion order; those keys just start with a full bucket again
+        for key in list(self._buckets)[: self.max_keys // 2]:
+            del self._buckets[key]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheStore:
+    """Fixed-window counters in a Django cache, shared by every worker using that cache."""
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    def hit(self, key, limit, period):
+        from django.core.cache import caches
+
+        cache = caches[self.alias]
+        now = time.time()
+        window = int(now // period)
+        cache_key = f"ratelimit:{key}:{window}"
+        cache.add(cache_key, 0, timeout=math.ceil(period))
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            # expired between add() and incr()
+            cache.set(cache_key, 1, timeout=math.ceil(period))
+            count = 1
+        if count <= limit:
+            return True, 0
+        return False, period - (now % period)
+
+
+_memory_store = MemoryStore()
+
+
+def get_store():
+    backend = getattr(settings, "AUTH_RATE_LIMIT_STORE", "memory")
+    if backend == "memory":
+        return _memory_store
+    # "cache" or "cache:<alias>"
+    _, _, alias = backend.partition(":")
+    return CacheStore(alias or "default")
+
+
+def client_ip(request):
+    if getattr(settings, "AUTH_RATE_LIMIT_TRUST_X_FORWARDED_FOR", False):
+        forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _request_email(request):
+    try:
+        data = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    email = data.get("email") if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def rate_limit(scope):
+    """Reject requests over the per-IP and per-email limits configured for ``scope``.
+
+    Limits come from settings.AUTH_RATE_LIMITS[scope], e.g.
+    {"ip": "20/h", "email": "3/10m"}. The check runs before the view, so a
+    rejected request never reaches Firebase, the database or SMTP.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limits = getattr(settings, "AUTH_RATE_LIMITS", {}).get(scope)
+            if limits and request.method == "POST":
+                # IP first: it needs no body parsing
+                retry_after = _check(scope, "ip", limits, lambda: client_ip(request))
+                if retry_after is None:
+                    retry_after = _check(scope, "email", limits, lambda: _request_email(request))
+                if retry_after is not None:
+                    response = JsonResponse(
+                        {'success': False, 'error': 'Too many requests. Please try again later.'},
+                        status=429,
+                    )
+                    response["Retry-After"] = str(math.ceil(retry_after))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _check(scope, kind, limits, get_key):
+    # returns None when allowed, otherwise the seconds until the next request is allowed
+    rate = limits.get(kind)
+    if not rate:
+        return None
+    key = get_key()
+    if not key:
+        return None
+    limit, period = parse_rate(rate)
+    allowed, retry_after = get_store().hit(f"{scope}:{kind}:{key}", limit, period)
+    return None if allowed else retry_after
@@ -1,3 +1,454 @@
-from django.test import TestCase
+import datetime
+import http.server
+import io
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from google.auth import crypt, jwt
+
+from .mail_queue import _claim, drain_outbox, enqueue_mail, retry_delay
+from .ratelimit import CacheStore, _memory_store, parse_rate
+from .models import OTP_VALID_SECONDS, OutboundEmail, PasswordResetOTP
+from .token_verifier import FirebaseTokenVerifier, TokenVerificationError, fetch_certs
+
+PROJECT_ID = "wattify-test"
+
+
+def make_key(kid):
+    """(signer, certificate PEM) for a locally generated RSA key."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return crypt.RSASigner.from_string(pem, key_id=kid), cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def mint_token(signer, uid="user-1", project_id=PROJECT_ID, expires_in=3600, **claims):
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{project_id}",
+        "aud": project_id,
+        "sub": uid,
+        "iat": now,
+        "exp": now + expires_in,
+        "auth_time": now,
+        **claims,
+    }
+    return jwt.encode(signer, payload).decode()
+
+
+class StubKeyEndpoint:
+    """Stands in for Google's certificate endpoint: serves ``certs`` and counts fetches."""
+
+    def __init__(self, certs, max_age=3600):
+        self.certs = certs
+        self.max_age = max_age
+        self.calls = 0
+
+    def __call__(self, url):
+        self.calls += 1
+        return dict(self.certs), self.max_age
+
+
+class FirebaseTokenVerifierTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.signer, cls.cert = make_key("key-1")
+        cls.other_signer, cls.other_cert = make_key("key-2")
+
+    def verifier(self, endpoint, **kwargs):
+        return FirebaseTokenVerifier(project_id=PROJECT_ID, fetch=endpoint, **kwargs)
+
+    def test_valid_token_is_verified_and_keys_are_cached(self):
+        endpoint = StubKeyEndpoint({"key-1": self.cert})
+        verifier = self.verifier(endpoint)
+
+        claims = verifier.verify(mint_token(self.signer, uid="alice"), check_revoked=False)
+        verifier.verify(mint_token(self.signer, uid="bob"), check_revoked=False)
+
+        self.assertEqual(claims["uid"], "alice")
+        self.assertEqual(endpoint.calls, 1)
+
+    def test_expired_keys_are_fetched_again(self):
+        endpoint = StubKeyEndpoint({"key-1": self.cert}, max_age=0)
+        verifier = self.verifier(endpoint)
+
+        verifier.verify(mint_token(self.signer, uid="alice"), check_revoked=False)
+        verifier.verify(mint_token(self.signer, uid="bob"), check_revoked=False)
+
+        self.assertEqual(endpoint.calls, 2)
+
+    def test_repeat_verification_uses_cached_claims(self):
+        endpoint = StubKeyEndpoint({"key-1": self.cert}, max_age=0)
+        verifier = self.verifier(endpoint)
+        token = mint_token(self.signer)
+
+        verifier.verify(token, check_revoked=False)
+        verifier.verify(token, check_revoked=False)
+
+        self.assertEqual(endpoint.calls, 1)
+
+    def test_invalid_tokens_are_rejected(self):
+        verifier = self.verifier(StubKeyEndpoint({"key-1": self.cert}))
+        invalid = {
+            "wrong audience": mint_token(self.signer, aud="someone-else"),
+            "wrong issuer": mint_token(self.signer, iss="https://evil.example.com"),
+            "expired": mint_token(self.signer, expires_in=-3600),
+            "empty subject": mint_token(self.signer, uid=""),
+            "malformed": "not-a-token",
+        }
+        for reason, token in invalid.items():
+            with self.subTest(reason), self.assertRaises(TokenVerificationError):
+                verifier.verify(token, check_revoked=False)
+
+    def test_unknown_key_ids_refresh_at_most_once_per_interval(self):
+        endpoint = StubKeyEndpoint({"key-1": self.cert})
+        verifier = self.verifier(endpoint, min_refresh=60)
+        verifier.verify(mint_token(self.signer), check_revoked=False)
+        # pretend the keys were fetched a while ago so an unknown kid may refresh once
+        verifier._last_fetch -= 120
+
+        forged_signer, _ = make_key("forged")
+        for i in range(3):
+            with self.assertRaises(TokenVerificationError):
+                verifier.verify(mint_token(forged_signer, uid=f"attacker-{i}"), check_revoked=False)
+
+        # the first forged token looks like a rotation; the others reuse the fresh keys
+        self.assertEqual(endpoint.calls, 2)
+
+    def test_rotated_key_is_picked_up(self):
+        endpoint = StubKeyEndpoint({"key-1": self.cert})
+        verifier = self.verifier(endpoint, min_refresh=0)
+        verifier.verify(mint_token(self.signer), check_revoked=False)
+
+        endpoint.certs = {"key-1": self.cert, "key-2": self.other_cert}
+        claims = verifier.verify(mint_token(self.other_signer, uid="rotated"), check_revoked=False)
+
+        self.assertEqual(claims["uid"], "rotated")
+        self.assertEqual(endpoint.calls, 2)
+
+    def test_keys_are_fetched_without_holding_the_lock(self):
+        verifier = None
+
+        def endpoint(url):
+            self.assertFalse(verifier._lock.locked())
+            return {"key-1": self.cert}, 3600
+
+        verifier = self.verifier(endpoint)
+        verifier.verify(mint_token(self.signer), check_revoked=False)
+
+    def test_revocation_is_rechecked_after_the_interval(self):
+        verifier = self.verifier(StubKeyEndpoint({"key-1": self.cert}), revocation_recheck=300)
+        token = mint_token(self.signer, uid="alice")
+        user = SimpleNamespace(disabled=False, tokens_valid_after_timestamp=0)
+        auth = SimpleNamespace(get_user=mock.Mock(return_value=user))
+
+        with mock.patch("auth_app.token_verifier.get_auth", return_value=auth):
+            verifier.verify(token)
+            verifier.verify(token)
+            self.assertEqual(auth.get_user.call_count, 1)
+
+            # revoked after the token was issued
+            user.tokens_valid_after_timestamp = (time.time() + 60) * 1000
+            verifier.invalidate_user("alice")
+            with self.assertRaises(TokenVerificationError):
+                verifier.verify(token)
+            self.assertEqual(auth.get_user.call_count, 2)
+
+    def test_tokens_issued_before_the_revocation_cutoff_are_rejected(self):
+        verifier = self.verifier(StubKeyEndpoint({"key-1": self.cert}))
+        now = int(time.time())
+        cutoff = now - 600
+        user = SimpleNamespace(disabled=False, tokens_valid_after_timestamp=cutoff * 1000)
+        auth = SimpleNamespace(get_user=lambda uid: user)
+        # refreshed after the cutoff, in a session that signed in before it
+        refreshed = mint_token(self.signer, iat=now - 60, auth_time=now - 3600)
+        stale = mint_token(self.signer, iat=now - 1200, auth_time=now - 3600)
+
+        with mock.patch("auth_app.token_verifier.get_auth", return_value=auth):
+            self.assertEqual(verifier.verify(refreshed)["uid"], "user-1")
+            with self.assertRaises(TokenVerificationError):
+                verifier.verify(stale)
+
+    def test_disabled_user_is_rejected(self):
+        verifier = self.verifier(StubKeyEndpoint({"key-1": self.cert}))
+        auth = SimpleNamespace(get_user=lambda uid: SimpleNamespace(disabled=True, tokens_valid_after_timestamp=0))
+
+        with mock.patch("auth_app.token_verifier.get_auth", return_value=auth):
+            with self.assertRaises(TokenVerificationError):
+                verifier.verify(mint_token(self.signer))
+
+
+class FetchCertsTests(SimpleTestCase):
+    def test_reads_certificates_and_cache_control(self):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps({"key-1": "PEM"}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", "public, max-age=19845, must-revalidate, no-transform")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        certs, max_age = fetch_certs(f"http://127.0.0.1:{server.server_port}/certs")
+
+        self.assertEqual(certs, {"key-1": "PEM"})
+        self.assertEqual(max_age, 19845)
+
+
+class FailingConnection:
+    """Email connection whose sends always fail, like an SMTP server that is down."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        self.attempts += 1
+        raise ConnectionRefusedError("smtp unavailable")
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    EMAIL_OUTBOX_WORKER=False,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS=30,
+)
+class MailOutboxTests(TestCase):
+    def enqueue(self, body="Your OTP for password reset is: 123456"):
+        return enqueue_mail("Password reset OTP", body, "noreply@example.com", ["user@example.com"])
+
+    def make_due(self, email):
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+
+    def test_queued_mail_is_sent_and_its_body_dropped(self):
+        email = self.enqueue()
+
+        self.assertEqual(drain_outbox(), {"sent": 1, "retried": 0, "failed": 0})
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("123456", mail.outbox[0].body)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.SENT)
+        self.assertEqual(email.body, "")
+        # nothing left to send
+        self.assertEqual(drain_outbox(), {"sent": 0, "retried": 0, "failed": 0})
+
+    def test_failed_send_is_retried_with_backoff(self):
+        email = self.enqueue()
+        connection = FailingConnection()
+
+        before = timezone.now()
+        self.assertEqual(drain_outbox(connection=connection)["retried"], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, "smtp unavailable")
+        self.assertGreaterEqual(email.next_attempt_at, before + datetime.timedelta(seconds=30))
+
+        # not due yet
+        self.assertEqual(drain_outbox(connection=connection)["retried"], 0)
+        self.assertEqual(connection.attempts, 1)
+
+        self.make_due(email)
+        drain_outbox(connection=connection)
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+        self.assertGreaterEqual(email.next_attempt_at, timezone.now() + datetime.timedelta(seconds=59))
+
+    def test_mail_fails_after_max_attempts(self):
+        email = self.enqueue()
+        connection = FailingConnection()
+        for _ in range(3):
+            self.make_due(email)
+            counts = drain_outbox(connection=connection)
+
+        self.assertEqual(counts["failed"], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.FAILED)
+        self.assertEqual(email.body, "")
+        self.assertEqual(mail.outbox, [])
+
+    def test_retry_delay_doubles_up_to_an_hour(self):
+        self.assertEqual(
+            [retry_delay(n).total_seconds() for n in (1, 2, 3, 10)],
+            [30, 60, 120, 3600],
+        )
+
+    def test_message_is_claimed_by_one_worker_only(self):
+        email = self.enqueue()
+        # two workers read the same due row
+        first, second = OutboundEmail.objects.get(pk=email.pk), OutboundEmail.objects.get(pk=email.pk)
+
+        self.assertTrue(_claim(first))
+        self.assertFalse(_claim(second))
+        # the lease keeps it out of the next drain
+        self.assertEqual(drain_outbox()["sent"], 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_prune_deletes_sent_and_failed_mail(self):
+        pending, sent, failed = self.enqueue(), self.enqueue(), self.enqueue()
+        OutboundEmail.objects.filter(pk=sent.pk).update(status=OutboundEmail.SENT)
+        OutboundEmail.objects.filter(pk=failed.pk).update(status=OutboundEmail.FAILED)
+
+        self.assertEqual(OutboundEmail.prune_finished(chunk_size=1), 2)
+        self.assertEqual(list(OutboundEmail.objects.values_list("pk", flat=True)), [pending.pk])
+
+
+class PruneOTPTests(TestCase):
+    def setUp(self):
+        expired_at = timezone.now() - datetime.timedelta(seconds=OTP_VALID_SECONDS + 60)
+        self.valid = [PasswordResetOTP.objects.create(email=f"valid{i}@example.com", otp="111111") for i in range(3)]
+        used = [PasswordResetOTP.objects.create(email=f"used{i}@example.com", otp="222222", is_used=True) for i in range(3)]
+        expired = [PasswordResetOTP.objects.create(email=f"expired{i}@example.com", otp="333333") for i in range(4)]
+        # created_at is auto_now_add, backdate it afterwards
+        PasswordResetOTP.objects.filter(pk__in=[otp.pk for otp in expired]).update(created_at=expired_at)
+        self.stale = len(used) + len(expired)
+
+    def remaining(self):
+        return sorted(PasswordResetOTP.objects.values_list("pk", flat=True))
+
+    def test_prune_expired_deletes_only_used_and_expired_otps(self):
+        self.assertEqual(PasswordResetOTP.prune_expired(chunk_size=2), self.stale)
+        self.assertEqual(self.remaining(), [otp.pk for otp in self.valid])
+        self.assertEqual(PasswordResetOTP.prune_expired(chunk_size=2), 0)
+
+    def test_prune_otps_command(self):
+        out = io.StringIO()
+        call_command("prune_otps", chunk_size=3, stdout=out)
+
+        self.assertIn(f"deleted {self.stale} expired OTP(s)", out.getvalue())
+        self.assertEqual(self.remaining(), [otp.pk for otp in self.valid])
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        _memory_store.reset()
+        self.addCleanup(_memory_store.reset)
+        self.auth = mock.Mock()
+        self.auth.get_user_by_email.return_value = SimpleNamespace(uid="user-1")
+        for target, patched in (("auth_app.views.get_auth", mock.Mock(return_value=self.auth)),
+                                ("auth_app.views.enqueue_mail", mock.Mock())):
+            patcher = mock.patch(target, patched)
+            setattr(self, target.rsplit(".", 1)[1], patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def send_otp(self, email, ip="10.0.0.1"):
+        return self.client.post(
+            reverse("send_otp_reset_password"), {"email": email}, content_type="application/json", REMOTE_ADDR=ip,
+        )
+
+    def verify_otp(self, email, ip="10.0.0.1"):
+        return self.client.post(
+            reverse("verify_password_and_reset_otp"), {"email": email, "otp": "000000", "newPassword": "hunter22"},
+            content_type="application/json", REMOTE_ADDR=ip,
+        )
+
+    def assert_limited(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.json()["success"])
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    @override_settings(AUTH_RATE_LIMITS={"send_otp": {"ip": "2/h"}})
+    def test_ip_limit(self):
+        for i in range(2):
+            self.assertEqual(self.send_otp(f"user{i}@example.com").status_code, 200)
+
+        self.assert_limited(self.send_otp("user9@example.com"))
+        # rejected before Firebase, the database and the outbox
+        self.assertEqual(self.get_auth.call_count, 2)
+        self.assertEqual(self.enqueue_mail.call_count, 2)
+        self.assertFalse(PasswordResetOTP.objects.filter(email="user9@example.com").exists())
+        # other clients are unaffected
+        self.assertEqual(self.send_otp("user9@example.com", ip="10.0.0.2").status_code, 200)
+
+    @override_settings(AUTH_RATE_LIMITS={"send_otp": {"email": "2/10m"}})
+    def test_email_limit_is_per_normalized_address(self):
+        self.assertEqual(self.send_otp("User@Example.com", ip="10.0.0.1").status_code, 200)
+        self.assertEqual(self.send_otp("  user@example.com ", ip="10.0.0.2").status_code, 200)
+
+        # a new IP doesn't reset the per-email limit
+        self.assert_limited(self.send_otp("USER@example.com", ip="10.0.0.3"))
+        self.assertEqual(self.enqueue_mail.call_count, 2)
+        self.assertEqual(self.send_otp("other@example.com", ip="10.0.0.3").status_code, 200)
+
+    @override_settings(AUTH_RATE_LIMITS={"verify_otp": {"ip": "60/h", "email": "1/h"}})
+    def test_verify_otp_is_limited_before_any_lookup(self):
+        PasswordResetOTP.objects.create(email="user@example.com", otp="123456")
+        self.assertIn("Invalid", self.verify_otp("user@example.com").json()["error"])
+
+        self.assert_limited(self.verify_otp("user@example.com"))
+        self.get_auth.assert_not_called()
+        self.assertFalse(PasswordResetOTP.objects.filter(is_used=True).exists())
+
+    @override_settings(AUTH_RATE_LIMITS={"send_otp": {"ip": "1/h"}}, AUTH_RATE_LIMIT_TRUST_X_FORWARDED_FOR=True)
+    def test_forwarded_client_ip_is_used_when_trusted(self):
+        self.assertEqual(self.send_otp("a@example.com", ip="10.0.0.1").status_code, 200)
+        response = self.client.post(
+            reverse("send_otp_reset_password"), {"email": "b@example.com"}, content_type="application/json",
+            REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.7, 10.0.0.1",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(AUTH_RATE_LIMITS={"send_otp": {"ip": "2/h"}}, AUTH_RATE_LIMIT_STORE="cache")
+    def test_cache_store_limits_requests(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        for i in range(2):
+            self.assertEqual(self.send_otp(f"user{i}@example.com").status_code, 200)
+        self.assert_limited(self.send_otp("user9@example.com"))
+        self.assertEqual(self.enqueue_mail.call_count, 2)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("5/10m"), (5, 600.0))
+        self.assertEqual(parse_rate("20/h"), (20, 3600.0))
+        self.assertEqual(parse_rate("1/30s"), (1, 30.0))
+        self.assertEqual(parse_rate("100/d"), (100, 86400.0))
+
+    def test_cache_store_fixed_window(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        store = CacheStore("default")
+
+        with mock.patch("auth_app.ratelimit.time.time", return_value=6000.0 + 15):
+            self.assertEqual(store.hit("k", 2, 60), (True, 0))
+            self.assertEqual(store.hit("k", 2, 60), (True, 0))
+            self.assertEqual(store.hit("k", 2, 60), (False, 45.0))
+            # separate keys count separately
+            self.assertEqual(store.hit("other", 2, 60), (True, 0))
+        # the next window starts from zero
+        with mock.patch("auth_app.ratelimit.time.time", return_value=6060.0):
+            self.assertEqual(store.hit("k", 2, 60), (True, 0))
@@ -0,0 +1,178 @@
+# auth_app/token_verifier.py
+
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.request
+
+from django.conf import settings
+
+from caching import SingleFlight, TTLCache
+from firebase import firebase_app, get_auth
+
+DEFAULT_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+
+class TokenVerificationError(Exception):
+    pass
+
+
+def _max_age(cache_control):
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else 0
+
+
+def fetch_certs(url):
+    """Download Google's signing certificates; returns (certs, max_age_seconds)."""
+    with urllib.request.urlopen(url, timeout=10) as response:
+        certs = json.loads(response.read().decode("utf-8"))
+        return certs, _max_age(response.headers.get("Cache-Control"))
+
+
+class FirebaseTokenVerifier:
+    """Verifies Firebase ID tokens locally.
+
+    Google's public certificates are cached until their Cache-Control
+    expiry; a token signed with an unknown key refreshes them early, but at
+    most once per ``min_refresh`` seconds, so forged ``kid`` headers can't
+    turn every verification into a fetch. Verified claims are cached until the token's ``exp``, and the
+    remote revocation lookup runs at most once per ``revocation_recheck``
+    seconds for each user.
+    """
+
+    def __init__(self, project_id=None, certs_url=None, revocation_recheck=None, clock_skew=10, fetch=fetch_certs,
+                 min_refresh=None):
+        self._project_id = project_id
+        self._certs_url = certs_url
+        self._revocation_recheck = revocation_recheck
+        self._min_refresh = min_refresh
+        self.clock_skew = clock_skew
+        self._fetch = fetch
+
+        self._lock = threading.Lock()
+        self._certs = None
+        self._certs_expire_at = 0
+        self._last_fetch = None
+        self._refresh = SingleFlight()
+        self.fetches = 0
+        self._claims = TTLCache(max_entries=getattr(settings, "FIREBASE_TOKEN_CACHE_SIZE", 4096))
+        self._revocation = TTLCache(max_entries=getattr(settings, "FIREBASE_TOKEN_CACHE_SIZE", 4096))
+
+    @property
+    def project_id(self):
+        return self._project_id or getattr(settings, "FIREBASE_PROJECT_ID", None) or firebase_app.get().project_id
+
+    @property
+    def certs_url(self):
+        return self._certs_url or getattr(settings, "FIREBASE_CERTS_URL", DEFAULT_CERTS_URL)
+
+    @property
+    def revocation_recheck(self):
+        if self._revocation_recheck is not None:
+            return self._revocation_recheck
+        return getattr(settings, "FIREBASE_REVOCATION_RECHECK_SECONDS", 300)
+
+    @property
+    def min_refresh(self):
+        if self._min_refresh is not None:
+            return self._min_refresh
+        return getattr(settings, "FIREBASE_CERTS_MIN_REFRESH_SECONDS", 60)
+
+    def _fetch_certs(self):
+        with self._lock:
+            self._last_fetch = time.monotonic()  # failed fetches count against the refresh limit too
+            self.fetches += 1
+        # the network call runs without the lock; concurrent callers share it through self._refresh
+        certs, max_age = self._fetch(self.certs_url)
+        with self._lock:
+            self._certs = certs
+            self._certs_expire_at = time.time() + max_age
+            return certs
+
+    def _get_certs(self, kid=None):
+        with self._lock:
+            certs = self._certs
+            fresh = certs is not None and time.time() < self._certs_expire_at
+            recently_fetched = self._last_fetch is not None and time.monotonic() - self._last_fetch < self.min_refresh
+        if fresh and (kid is None or kid in certs):
+            return certs
+        if fresh and recently_fetched:
+            # an unknown key right after a fetch: a forged header more likely than another rotation
+            return certs
+        # expired, or a key we haven't seen yet (key rotation)
+        return self._refresh.do("certs", self._fetch_certs)
+
+    def _decode(self, id_token):
+        from google.auth import jwt
+
+        try:
+            header = jwt.decode_header(id_token)
+        except Exception as e:
+            raise TokenVerificationError(f"Malformed ID token: {e}")
+        if header.get("alg") != "RS256":
+            raise TokenVerificationError("ID token has an unexpected signing algorithm.")
+
+        project_id = self.project_id
+        try:
+            claims = jwt.decode(
+                id_token,
+                certs=self._get_certs(header.get("kid")),
+                audience=project_id,
+                clock_skew_in_seconds=self.clock_skew,
+            )
+        except ValueError as e:
+            raise TokenVerificationError(f"Invalid ID token: {e}")
+
+        if claims.get("iss") != f"https://securetoken.google.com/{project_id}":
+            raise TokenVerificationError("ID token has an incorrect issuer.")
+        if not claims.get("sub") or len(claims["sub"]) > 128:
+            raise TokenVerificationError("ID token has an invalid subject.")
+        claims["uid"] = claims["sub"]
+        return claims
+
+    def _check_revoked(self, claims):
+        uid = claims["uid"]
+        state = self._revocation.get(uid)
+        if state is None:
+            user = get_auth().get_user(uid)
+            state = {
+                "disabled": user.disabled,
+                # in milliseconds
+                "valid_after": user.tokens_valid_after_timestamp or 0,
+            }
+            self._revocation.set(uid, state, ttl=self.revocation_recheck)
+
+        if state["disabled"]:
+            raise TokenVerificationError("The user record is disabled.")
+        # like firebase_admin: tokens issued before the cutoff are revoked, later ones from the same sign-in are not
+        if claims["iat"] * 1000 < state["valid_after"]:
+            raise TokenVerificationError("The Firebase ID token has been revoked.")
+
+    def verify(self, id_token, check_revoked=True):
+        key = hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+        claims = self._claims.get(key)
+        if claims is None:
+            claims = self._decode(id_token)
+            ttl = claims["exp"] + self.clock_skew - time.time()
+            if ttl > 0:
+                self._claims.set(key, claims, ttl=ttl)
+
+        if check_revoked:
+            self._check_revoked(claims)
+        return dict(claims)
+
+    def invalidate_user(self, uid):
+        """Force the next verification for ``uid`` to re-check revocation remotely."""
+        self._revocation.delete(uid)
+
+    def stats(self):
+        return {"claims": self._claims.stats(), "revocation": self._revocation.stats(), "cert_fetches": self.fetches}
+
+
+token_verifier = FirebaseTokenVerifier()
+
+
+def verify_id_token(id_token, check_revoked=True):
+    return token_verifier.verify(id_token, check_revoked=check_revoked)
@@ -1,17 +1,17 @@
 import json
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-import firebase_admin
-from firebase_admin import auth
-from firebase import firebase_admin
+from firebase import get_auth
 import random
 import string
 import datetime
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from django.db import models
 from .models import PasswordResetOTP
+from .token_verifier import verify_id_token, token_verifier
+from .mail_queue import enqueue_mail
+from .ratelimit import rate_limit
 
 @csrf_exempt
 def firebase_verify_login_token(request):
@@ -26,7 +26,8 @@ def firebase_verify_login_token(request):
             return JsonResponse({"error": "ID token is required."}, status=400)
 
         try:
-            decoded_token = auth.verify_id_token(id_token, check_revoked=True, clock_skew_seconds=10)
+            # verified locally against cached Google keys; revocation is re-checked periodically
+            decoded_token = verify_id_token(id_token, check_revoked=True)
             uid = decoded_token["uid"]
 
             return JsonResponse({"success": True, "uid": uid, "message": "Login successful"})
@@ -50,7 +51,8 @@ def firebase_verify_google_token(request):
             return JsonResponse({"error": "ID token is required."}, status=400)
 
         try:
-            decoded_token = auth.verify_id_token(id_token, check_revoked=True, clock_skew_seconds=10)
+            # verified locally against cached Google keys; revocation is re-checked periodically
+            decoded_token = verify_id_token(id_token, check_revoked=True)
             uid = decoded_token["uid"]
             email = decoded_token.get("email", "")
 
@@ -74,6 +76,7 @@ def generate_otp():
 
 # send password reset OTP to email
 @csrf_exempt
+@rate_limit("send_otp")
 def send_otp_reset_password(request):
     if request.method != "POST":
         return JsonResponse({'success': False, 'error': 'Only POST method is allowed'})
@@ -86,6 +89,8 @@ def send_otp_reset_password(request):
         if not email:
             return JsonResponse({'success': False, 'error': 'Email is required'})
         
+        # initialize firebase outside the lookup below so config errors aren't masked
+        auth = get_auth()
         try: 
             user = auth.get_user_by_email(email)
         except:
@@ -101,12 +106,12 @@ def send_otp_reset_password(request):
         # create a new OTP entry
         PasswordResetOTP.objects.create(email=email, otp=otp)
         
-        # send OTP to email
+        # queue the OTP email; the mail dispatcher delivers it outside the request
         subject = 'Password Reset OTP'
         message = message = f'Your OTP for password reset is: {otp}\nThis OTP is valid for 10 minutes.'
         from_email = settings.DEFAULT_FROM_EMAIL
         recipient_list = [email]
-        send_mail(subject, message, from_email, recipient_list)
+        enqueue_mail(subject, message, from_email, recipient_list)
         
         return JsonResponse({'success': True, 'message': 'OTP sent successfully'})
         
@@ -117,6 +122,7 @@ def send_otp_reset_password(request):
     
 # verify OTP and reset password
 @csrf_exempt
+@rate_limit("verify_otp")
 def verify_otp_and_reset_password(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Only POST method is allowed'})
@@ -146,9 +152,11 @@ def verify_otp_and_reset_password(request):
         
         try:
             # reset password in firebase
-            user = auth.get_user_by_email(email)
+            user = get_auth().get_user_by_email(email)
         
-            auth.update_user(user.uid, password=new_password)
+            get_auth().update_user(user.uid, password=new_password)
+            # a password change revokes existing sessions, don't trust the cached revocation state
+            token_verifier.invalidate_user(user.uid)
         
             return JsonResponse({'success': True, 'message': 'Password reset successfully'})
         except Exception as e:
@@ -23,13 +23,20 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
+# "development" (default) or "production"; gunicorn.conf.py and `manage.py serve` set production
+DJANGO_ENV = os.getenv("DJANGO_ENV", "development")
+PRODUCTION = DJANGO_ENV == "production"
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-1wqlwantw)x-9#)u+)^dt0py%$lmh5-kqzo)1^_4w$bcfuhd^i'
+SECRET_KEY = os.getenv("DJANGO_SECRET_KEY") or 'django-insecure-1wqlwantw)x-9#)u+)^dt0py%$lmh5-kqzo)1^_4w$bcfuhd^i'
+if PRODUCTION and not os.getenv("DJANGO_SECRET_KEY"):
+    raise ValueError("DJANGO_SECRET_KEY not found in environment variables.")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# debug keeps every SQL query of a request in memory and serves tracebacks
+DEBUG = os.getenv("DJANGO_DEBUG", "0" if PRODUCTION else "1") == "1"
 
-ALLOWED_HOSTS = ['*'] # For development only, use specific host in production
+ALLOWED_HOSTS = os.getenv("DJANGO_ALLOWED_HOSTS", "*").split(",")  # e.g. "api.example.com,localhost" in production
 
 
 # Application definition
@@ -98,6 +105,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60 if PRODUCTION else 0,  # gunicorn threads keep their connection between requests
+        'CONN_HEALTH_CHECKS': PRODUCTION,
+        'OPTIONS': {
+            # concurrent (async) requests write from several connections: take the write lock
+            # when a transaction starts and wait for it, instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -143,9 +158,98 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ML prediction
+# .json/.ubj models written by `manage.py train_model` are loaded natively, anything else with joblib
+ML_MODEL_PATH = os.getenv("ML_MODEL_PATH") or BASE_DIR / 'models' / 'xgb_total_bill_model_tuned_may.pkl'
+ML_PRELOAD_MODEL = os.getenv("ML_PRELOAD_MODEL", "1") == "1"  # load the model, history and seasonal tables in MlPredictConfig.ready()
+ML_PRELOAD_FORECASTING = PRODUCTION  # also import statsmodels up front, before gunicorn forks its workers
+# "xgboost", or "numpy" to predict from the model's trees flattened into NumPy arrays (same outputs, lower latency)
+ML_INFERENCE_BACKEND = os.getenv("ML_INFERENCE_BACKEND", "xgboost")
+ML_DATASET_PATH = BASE_DIR / 'data' / 'enhanced_kWh_800_edited_records.csv'
+ML_PAST_RATES_PATH = BASE_DIR.parent / 'frontend' / 'seconsumptiontracker-app' / 'src' / 'assets' / 'datas' / 'pastRates.json'
+# "sarimax" (statsmodels) or "ar1_lstsq" (the same model solved by least squares in NumPy)
+ML_FORECAST_ENGINE = os.getenv("ML_FORECAST_ENGINE", "sarimax")
+ML_FORECAST_MAX_HORIZON = 24  # months of forecast path cached per fitted series
+ML_FORECAST_CACHE_SIZE = 32
+ML_FORECAST_EXECUTOR = os.getenv("ML_FORECAST_EXECUTOR", "thread")  # "thread", "process" or "serial"
+ML_FORECAST_WORKERS = 3  # one per forecasted feature
+ML_FORECAST_TIMEOUT = 20  # seconds to wait for a fit before using the seasonal naive fallback
+ML_ASYNC_CPU_WORKERS = int(os.getenv("ML_ASYNC_CPU_WORKERS", "4"))  # threads async views use for forecasting/inference
+ML_PREDICT_RANGE_MAX_MONTHS = 36  # upper bound for /api/predict/range/
+ML_PREDICT_MAX_MONTHS_AHEAD = 36  # furthest target after the last month of history
+ML_PREDICT_BATCH_MAX_ITEMS = 500  # upper bound for /api/predict/batch/
+ML_SNAPSHOT_ENABLED = True  # serve /api/predict/ from snapshots written by build_prediction_snapshots
+ML_SNAPSHOT_REFRESH_SECONDS = 60  # how often workers re-read snapshots from the database
+ML_TRAIN_OUTPUT_PATH = BASE_DIR / 'models' / 'xgb_total_bill_model.ubj'
+ML_TRAIN_NTHREAD = int(os.getenv("ML_TRAIN_NTHREAD", "0"))  # 0 = all cores
+
+# Logging: debug output of the prediction path and per-stage timings (see instrumentation.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+INSTRUMENTATION_SPAN_LOG_LEVEL = os.getenv("INSTRUMENTATION_SPAN_LOG_LEVEL", "DEBUG")  # level span timings are logged at
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '[{levelname}] {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'ml_predict': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+        'auth_app': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+        'instrumentation': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
+# Caches. "shared" holds ML and external-API results for every worker on the host (caching.SharedCache);
+# FileBasedCache writes each entry to a temp file and renames it into place, so readers never see partial writes
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR") or BASE_DIR / '.cache' / 'shared'
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': SHARED_CACHE_DIR,
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "5000"))},
+    },
+}
+SHARED_CACHE_ALIAS = os.getenv("SHARED_CACHE_ALIAS", "shared") or None  # empty keeps every cache per process
+ML_PREDICTION_CACHE_TTL = 24 * 60 * 60  # seconds; keys include the source version, so stale payloads just miss
+
+# Hugging Face recommendation Space (a URL such as http://127.0.0.1:7860/ also works)
+HF_RECOMMENDATION_SPACE = os.getenv("HF_RECOMMENDATION_SPACE", "Wh1plashR/AppTry")
+HF_RECOMMENDATION_API_NAME = "/predict"
+HF_RECOMMENDATION_CONCURRENCY = int(os.getenv("HF_RECOMMENDATION_CONCURRENCY", "2"))  # pooled clients / parallel calls
+HF_RECOMMENDATION_QUEUE_SIZE = int(os.getenv("HF_RECOMMENDATION_QUEUE_SIZE", "16"))  # callers allowed to wait for a slot
+HF_RECOMMENDATION_TIMEOUT = 120  # seconds a caller waits for a free slot
+HF_RECOMMENDATION_CACHE_SIZE = 512
+HF_RECOMMENDATION_CACHE_TTL = 24 * 60 * 60  # seconds
+
+# Appliance wattage lookups (Gemini), persisted in geminiApi.ApplianceWattage
+WATTAGE_CACHE_SIZE = 1024  # in-memory LRU in front of the database
+WATTAGE_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+WATTAGE_BULK_MAX_NAMES = 100
+
 CORS_ALLOW_ALL_ORIGINS = True # For development only, use specific origin in production
 CORS_ALLOW_CREDENTIALS = True
 
+# Firebase ID-token verification (auth_app.token_verifier)
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")  # defaults to the service account's project
+FIREBASE_CERTS_URL = os.getenv("FIREBASE_CERTS_URL", "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com")
+FIREBASE_TOKEN_CACHE_SIZE = 4096
+FIREBASE_REVOCATION_RECHECK_SECONDS = 300  # how stale the revocation check may be
+FIREBASE_CERTS_MIN_REFRESH_SECONDS = 60  # tokens with an unknown key id refresh the certificates at most this often
+
+# Rate limits for the OTP endpoints ("<requests>/<period>", period units s/m/h/d)
+AUTH_RATE_LIMITS = {
+    'send_otp': {'ip': '20/h', 'email': '3/10m'},
+    'verify_otp': {'ip': '60/h', 'email': '10/10m'},
+}
+AUTH_RATE_LIMIT_STORE = 'memory'  # or 'cache' / 'cache:<alias>' to share counters through a Django cache
+AUTH_RATE_LIMIT_TRUST_X_FORWARDED_FOR = False  # only behind a proxy that sets it
+
 # for SMTP service
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -155,5 +259,12 @@ EMAIL_HOST_USER = 'seconsumptiontracker@gmail.com'
 EMAIL_HOST_PASSWORD = os.getenv("APP_PASSWORD")  # Use environment variables for security
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# outgoing mail is queued in auth_app.OutboundEmail and sent by auth_app.mail_queue
+EMAIL_OUTBOX_WORKER = os.getenv("EMAIL_OUTBOX_WORKER", "1") == "1"  # in-process sender thread; disable to use drain_outbox only
+EMAIL_OUTBOX_BATCH_SIZE = 50  # messages sent per SMTP connection
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30  # doubled after every failed attempt
+EMAIL_OUTBOX_POLL_SECONDS = 30
+
 if not EMAIL_HOST_PASSWORD:
     raise ValueError("APP_PASSWORD not found in environment variables.")
\ No newline at end of file
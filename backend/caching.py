@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= now:
+                if entry is not _MISSING:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+class SharedCache:
+    """One namespace of versioned keys in the Django cache every worker on the host shares.
+
+    Values live in the SHARED_CACHE_ALIAS cache (a FileBasedCache by default,
+    whose writes are atomic renames) under ``<namespace>:v<version>:<sha1>``,
+    so bumping ``version`` after changing what is stored makes old entries
+    miss instead of being misread. The shared layer is best-effort: with
+    SHARED_CACHE_ALIAS = None, or when the backend fails, every lookup is a miss.
+    """
+
+    def __init__(self, namespace, version=1, timeout=None):
+        self.namespace = namespace
+        self.version = version
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _backend(self):
+        from django.core.cache import caches
+
+        alias = getattr(settings, "SHARED_CACHE_ALIAS", "shared")
+        return caches[alias] if alias else None
+
+    def make_key(self, key):
+        digest = hashlib.sha1(str(key).encode()).hexdigest()
+        return f"{self.namespace}:v{self.version}:{digest}"
+
+    def _failed(self, action, error):
+        self.errors += 1
+        logger.warning("shared cache %s failed for %s: %s", action, self.namespace, error)
+
+    def get(self, key, default=None):
+        try:
+            backend = self._backend()
+            value = backend.get(self.make_key(key), _MISSING) if backend is not None else _MISSING
+        except Exception as e:
+            self._failed("get", e)
+            value = _MISSING
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached."""
+        keys = list(keys)
+        try:
+            backend = self._backend()
+            found = backend.get_many([self.make_key(key) for key in keys]) if backend is not None else {}
+        except Exception as e:
+            self._failed("get_many", e)
+            found = {}
+        values = {key: found[self.make_key(key)] for key in keys if self.make_key(key) in found}
+        self.hits += len(values)
+        self.misses += len(keys) - len(values)
+        return values
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            backend = self._backend()
+            if backend is None:
+                return
+            if timeout is None:
+                backend.set(self.make_key(key), value)
+            else:
+                backend.set(self.make_key(key), value, timeout=timeout)
+        except Exception as e:
+            self._failed("set", e)
+
+    # the file backend's own async methods run on the thread-sensitive executor, one call at a time
+    async def aget(self, key, default=None):
+        return await sync_to_async(self.get, thread_sensitive=False)(key, default)
+
+    async def aset(self, key, value, timeout=None):
+        await sync_to_async(self.set, thread_sensitive=False)(key, value, timeout)
+
+    def clear(self):
+        """Empty the whole shared cache alias, not just this namespace."""
+        backend = self._backend()
+        if backend is not None:
+            backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "alias": getattr(settings, "SHARED_CACHE_ALIAS", "shared"),
+            "namespace": self.namespace,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one execution.
+
+    The first caller runs the function; callers arriving while it is in
+    flight wait for it and get the same result (or the same exception).
+    Sync (``do``) and async (``ado``) callers share in-flight calls; an async
+    call keeps running when the caller that started it is cancelled.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.async_waiters = []  # (loop, future) pairs of awaiting coroutines
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = set()  # running ado() calls; the event loop only keeps weak references
+        self.coalesced = 0
+
+    def _join(self, key):
+        # returns (call, is_leader)
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = self._Call()
+                return call, True
+            self.coalesced += 1
+            return call, False
+
+    def _finish(self, key, call):
+        with self._lock:
+            del self._calls[key]
+            call.done.set()
+            waiters, call.async_waiters = call.async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve_future, future, call)
+
+    def do(self, key, fn):
+        call, leader = self._join(key)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    async def ado(self, key, coro_fn):
+        call, leader = self._join(key)
+        if not leader:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self._lock:
+                finished = call.done.is_set()
+                if not finished:
+                    call.async_waiters.append((loop, future))
+            if finished:
+                _resolve_future(future, call)
+            return await future
+
+        # the call runs as its own task: cancelling the leader (a client disconnect) leaves it
+        # running for the callers that joined it
+        task = asyncio.ensure_future(self._lead(key, call, coro_fn))
+        self._tasks.add(task)
+        task.add_done_callback(self._forget_task)
+        return await asyncio.shield(task)
+
+    async def _lead(self, key, call, coro_fn):
+        try:
+            call.result = await coro_fn()
+            return call.result
+        except BaseException as e:  # includes cancellation, waiters must not hang or get None
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def _forget_task(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled():
+            task.exception()  # already handed to the waiters; don't log it as never retrieved
+
+
+def _resolve_future(future, call):
+    if future.done():
+        return
+    if call.error is not None:
+        future.set_exception(call.error)
+    else:
+        future.set_result(call.result)
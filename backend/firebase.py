@@ -1,10 +1,24 @@
 import os
 import json
-import firebase_admin
-from firebase_admin import credentials, db
-
-if not firebase_admin._apps:  # Prevent re-initialization
-    cred = credentials.Certificate('firebase-service-account.json')
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': 'https://seconsumptiontracker-d337e-default-rtdb.firebaseio.com/'
-    }) 
+
+from services import LazyService
+
+def _initialize_app():
+    # firebase_admin (and the service-account file) are only touched on first use
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:  # Prevent re-initialization
+        cred = credentials.Certificate(os.getenv('FIREBASE_SERVICE_ACCOUNT', 'firebase-service-account.json'))
+        firebase_admin.initialize_app(cred, {
+            'databaseURL': 'https://seconsumptiontracker-d337e-default-rtdb.firebaseio.com/'
+        })
+    return firebase_admin.get_app()
+
+firebase_app = LazyService(_initialize_app)
+
+def get_auth():
+    """firebase_admin.auth, with the default app initialized."""
+    firebase_app.get()
+    from firebase_admin import auth
+    return auth
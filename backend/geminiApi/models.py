@@ -1,3 +1,12 @@
 from django.db import models
 
 # Create your models here.
+class ApplianceWattage(models.Model):
+    # normalized appliance name, see geminiApi.wattage.normalize_appliance_name
+    name = models.CharField(max_length=255, unique=True)
+    wattage = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.wattage}"
@@ -1,3 +1,133 @@
-from django.test import TestCase
+import asyncio
+import json
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from . import wattage
+from .models import ApplianceWattage
+
+
+class FakeGenaiClient:
+    """Stands in for genai.Client: records every prompt and answers from ``reply(prompt)``."""
+
+    def __init__(self, reply):
+        self.prompts = []
+        client = self
+
+        class Models:
+            def generate_content(self, model, contents):
+                client.prompts.append(contents)
+                return SimpleNamespace(text=reply(contents))
+
+        class AsyncModels:
+            async def generate_content(self, model, contents):
+                return Models().generate_content(model, contents)
+
+        self.models = Models()
+        self.aio = SimpleNamespace(models=AsyncModels())
+
+
+def bulk_reply(wattages):
+    """Answer bulk prompts with the given wattages, leaving out names that aren't in ``wattages``."""
+    def reply(prompt):
+        names = json.loads(prompt[prompt.index("["):prompt.index("]") + 1])
+        return json.dumps({name: wattages[name] for name in names if name in wattages})
+    return reply
+
+
+def failing_reply(prompt):
+    raise RuntimeError("quota exceeded")
+
+
+@override_settings(SHARED_CACHE_ALIAS=None)
+class LookupWattageTests(TestCase):
+    def setUp(self):
+        wattage._memory_cache.clear()
+        self.addCleanup(wattage._memory_cache.clear)
+
+    def test_miss_asks_gemini_once_and_stores_the_answer(self):
+        client = FakeGenaiClient(lambda prompt: " 700 ")
+
+        self.assertEqual(wattage.lookup_wattage("Microwave  Oven", genai_client=client), "700")
+        self.assertEqual(wattage.lookup_wattage("microwave oven", genai_client=client), "700")
+
+        self.assertEqual(len(client.prompts), 1)
+        self.assertEqual(ApplianceWattage.objects.get(name="microwave oven").wattage, "700")
+
+    def test_stored_wattage_is_used_without_gemini(self):
+        ApplianceWattage.objects.create(name="electric fan", wattage="75")
+        client = FakeGenaiClient(failing_reply)
+
+        self.assertEqual(wattage.lookup_wattage("Electric Fan", genai_client=client), "75")
+        self.assertEqual(client.prompts, [])
+
+    def test_errors_are_returned_but_not_cached(self):
+        client = FakeGenaiClient(failing_reply)
+
+        first = wattage.lookup_wattage("Microwave", genai_client=client)
+        second = wattage.lookup_wattage("Microwave", genai_client=client)
+
+        self.assertTrue(first.startswith("Error"))
+        self.assertTrue(second.startswith("Error"))
+        self.assertEqual(len(client.prompts), 2)
+        self.assertFalse(ApplianceWattage.objects.exists())
+
+
+@override_settings(SHARED_CACHE_ALIAS=None)
+class LookupWattagesTests(TestCase):
+    def setUp(self):
+        wattage._memory_cache.clear()
+        self.addCleanup(wattage._memory_cache.clear)
+
+    def test_only_misses_go_into_the_prompt(self):
+        ApplianceWattage.objects.create(name="microwave", wattage="1000")
+        client = FakeGenaiClient(bulk_reply({"Rice Cooker": 500, "Television": 100}))
+
+        result = wattage.lookup_wattages(["Microwave", "Rice Cooker", "rice  cooker", "Television"], genai_client=client)
+
+        self.assertEqual(result, {"Microwave": "1000", "Rice Cooker": "500", "rice  cooker": "500", "Television": "100"})
+        self.assertEqual(len(client.prompts), 1)
+        names = json.loads(client.prompts[0][client.prompts[0].index("["):client.prompts[0].index("]") + 1])
+        # one spelling per normalized name, and nothing that was already stored
+        self.assertEqual(sorted(names), ["Rice Cooker", "Television"])
+
+        # everything is cached now
+        wattage.lookup_wattages(["Microwave", "Rice Cooker", "Television"], genai_client=client)
+        self.assertEqual(len(client.prompts), 1)
+
+    def test_missing_values_are_not_cached(self):
+        client = FakeGenaiClient(bulk_reply({"Rice Cooker": 500}))
+
+        result = wattage.lookup_wattages(["Rice Cooker", "Flux Capacitor"], genai_client=client)
+
+        self.assertEqual(result["Rice Cooker"], "500")
+        self.assertTrue(result["Flux Capacitor"].startswith("Error"))
+        self.assertEqual(list(ApplianceWattage.objects.values_list("name", flat=True)), ["rice cooker"])
+
+        wattage.lookup_wattages(["Flux Capacitor"], genai_client=client)
+        self.assertEqual(len(client.prompts), 2)
+
+
+# the async lookup does its database work on another thread, which needs committed rows
+@override_settings(SHARED_CACHE_ALIAS=None)
+class AsyncLookupWattageTests(TransactionTestCase):
+    def setUp(self):
+        wattage._memory_cache.clear()
+        self.addCleanup(wattage._memory_cache.clear)
+
+    def test_concurrent_lookups_share_one_gemini_call(self):
+        client = FakeGenaiClient(lambda prompt: "1500")
+
+        async def scenario():
+            return await asyncio.gather(*(wattage.alookup_wattage("Aircon", genai_client=client) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(scenario()), ["1500"] * 5)
+        self.assertEqual(len(client.prompts), 1)
+        self.assertEqual(ApplianceWattage.objects.get(name="aircon").wattage, "1500")
+
+    def test_async_errors_are_not_cached(self):
+        client = FakeGenaiClient(failing_reply)
+
+        self.assertTrue(asyncio.run(wattage.alookup_wattage("Aircon", genai_client=client)).startswith("Error"))
+        self.assertFalse(ApplianceWattage.objects.exists())
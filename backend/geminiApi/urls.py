@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import fetch_appliance_wattage
+from .views import fetch_appliance_wattage, fetch_appliance_wattages, wattage_cache_stats
 
 urlpatterns = [
     path("get-wattage/", fetch_appliance_wattage, name="get_wattage"),
-]
\ No newline at end of file
+    path("get-wattage/bulk/", fetch_appliance_wattages, name="get_wattage_bulk"),
+    path("get-wattage/stats/", wattage_cache_stats, name="get_wattage_stats"),
+]
@@ -1,13 +1,45 @@
+import json
+
+from django.conf import settings
 from django.http import JsonResponse
-from gemini_service import get_appliance_wattage
+from django.views.decorators.csrf import csrf_exempt
+
+from .wattage import alookup_wattage, lookup_wattages, cache_stats
 
-def fetch_appliance_wattage(request):
+async def fetch_appliance_wattage(request):
     appliance_name = request.GET.get("appliance", "")
     
     if not appliance_name:
         return JsonResponse({"error": "Appliance name is required"}, status=400)
     
-    wattage_info = get_appliance_wattage(appliance_name)
+    # served from the wattage cache, Gemini is only asked on a miss
+    wattage_info = await alookup_wattage(appliance_name)
     
     # Convert string to dictionary
-    return JsonResponse({"wattage_info": wattage_info})
\ No newline at end of file
+    return JsonResponse({"wattage_info": wattage_info})
+
+@csrf_exempt
+def fetch_appliance_wattages(request):
+    # POST {"appliances": ["Microwave", "Electric Fan", ...]}
+    if request.method != "POST":
+        return JsonResponse({"error": "POST request required."}, status=400)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format."}, status=400)
+
+    names = data.get("appliances") if isinstance(data, dict) else None
+    if not isinstance(names, list) or not names or not all(isinstance(n, str) and n.strip() for n in names):
+        return JsonResponse({"error": "'appliances' must be a non-empty list of names."}, status=400)
+
+    max_names = getattr(settings, "WATTAGE_BULK_MAX_NAMES", 100)
+    if len(names) > max_names:
+        return JsonResponse({"error": f"At most {max_names} appliances per request."}, status=400)
+    if any(len(n) > 255 for n in names):
+        return JsonResponse({"error": "Appliance names must be at most 255 characters."}, status=400)
+
+    return JsonResponse({"wattage_info": lookup_wattages(names)})
+
+def wattage_cache_stats(request):
+    return JsonResponse(cache_stats())
@@ -0,0 +1,149 @@
+# geminiApi/wattage.py
+
+from django.conf import settings
+
+from caching import SharedCache, SingleFlight, TTLCache
+from services import BoundedExecutor
+from .models import ApplianceWattage
+
+import gemini_service
+
+# wattages practically never change, so entries live for a long time
+_memory_cache = TTLCache(
+    max_entries=getattr(settings, "WATTAGE_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "WATTAGE_CACHE_TTL", 7 * 24 * 60 * 60),
+)
+# shared by every worker on the host, in front of the database
+_shared_cache = SharedCache("wattage", timeout=getattr(settings, "WATTAGE_CACHE_TTL", 7 * 24 * 60 * 60))
+_in_flight = SingleFlight()
+
+# database work of the async lookups: one thread and one SQLite connection, so concurrent
+# requests queue here instead of contending for the database lock
+_db_executor = BoundedExecutor(1, name="wattage-db")
+
+
+def normalize_appliance_name(name):
+    return " ".join(str(name).lower().split())
+
+
+def _is_error(value):
+    return value.startswith("Error")
+
+
+def _store(key, wattage):
+    ApplianceWattage.objects.update_or_create(name=key, defaults={"wattage": wattage})
+    _shared_cache.set(key, wattage)
+    _memory_cache.set(key, wattage)
+
+
+def lookup_wattage(appliance_name, genai_client=None):
+    """Wattage text for one appliance: memory LRU, then the shared cache, then the database, then Gemini."""
+    key = normalize_appliance_name(appliance_name)
+    wattage = _memory_cache.get(key)
+    if wattage is not None:
+        return wattage
+
+    def fetch():
+        wattage = _shared_cache.get(key)
+        if wattage is not None:
+            _memory_cache.set(key, wattage)
+            return wattage
+
+        row = ApplianceWattage.objects.filter(name=key).only("wattage").first()
+        if row is not None:
+            _shared_cache.set(key, row.wattage)
+            _memory_cache.set(key, row.wattage)
+            return row.wattage
+
+        wattage = gemini_service.get_appliance_wattage(appliance_name, genai_client=genai_client)
+        # errors are returned to the caller but never cached
+        if not _is_error(wattage):
+            _store(key, wattage)
+        return wattage
+
+    return _in_flight.do(key, fetch)
+
+
+async def alookup_wattage(appliance_name, genai_client=None):
+    """Async variant of lookup_wattage for ASGI views, using the async Gemini client."""
+    key = normalize_appliance_name(appliance_name)
+    wattage = _memory_cache.get(key)
+    if wattage is not None:
+        return wattage
+
+    def stored():
+        row = ApplianceWattage.objects.filter(name=key).only("wattage").first()
+        return row.wattage if row is not None else None
+
+    async def fetch():
+        wattage = await _shared_cache.aget(key)
+        if wattage is not None:
+            _memory_cache.set(key, wattage)
+            return wattage
+
+        wattage = await _db_executor.run(stored)
+        if wattage is not None:
+            await _shared_cache.aset(key, wattage)
+            _memory_cache.set(key, wattage)
+            return wattage
+
+        wattage = await gemini_service.aget_appliance_wattage(appliance_name, genai_client=genai_client)
+        if not _is_error(wattage):
+            await _db_executor.run(_store, key, wattage)
+        return wattage
+
+    return await _in_flight.ado(key, fetch)
+
+
+def lookup_wattages(appliance_names, genai_client=None):
+    """Wattage text for many appliances; only the misses go to Gemini, in one prompt.
+
+    Returns a dict keyed by the names as given.
+    """
+    keys = {name: normalize_appliance_name(name) for name in appliance_names}
+    found = {}
+
+    missing = set()
+    for key in set(keys.values()):
+        wattage = _memory_cache.get(key)
+        if wattage is None:
+            missing.add(key)
+        else:
+            found[key] = wattage
+
+    if missing:
+        for key, wattage in _shared_cache.get_many(missing).items():
+            found[key] = wattage
+            _memory_cache.set(key, wattage)
+        missing -= found.keys()
+
+    if missing:
+        for row in ApplianceWattage.objects.filter(name__in=missing).only("name", "wattage"):
+            found[row.name] = row.wattage
+            _shared_cache.set(row.name, row.wattage)
+            _memory_cache.set(row.name, row.wattage)
+        missing -= found.keys()
+
+    if missing:
+        # ask with one representative original spelling per normalized name
+        originals = {}
+        for name, key in keys.items():
+            if key in missing:
+                originals.setdefault(key, name)
+        fetched = gemini_service.get_appliance_wattages(list(originals.values()), genai_client=genai_client)
+        for key, name in originals.items():
+            wattage = fetched[name]
+            if not _is_error(wattage):
+                _store(key, wattage)
+            found[key] = wattage
+
+    return {name: found[key] for name, key in keys.items()}
+
+
+def cache_stats():
+    return {
+        **_memory_cache.stats(),
+        "coalesced": _in_flight.coalesced,
+        "shared": _shared_cache.stats(),
+        "stored": ApplianceWattage.objects.count(),
+    }
@@ -1,32 +1,99 @@
-from google import genai
+import json
 import os
 from dotenv import load_dotenv
 
+from services import LazyService
+
 load_dotenv()
 
-# Load API key
-GENAI_API_KEY = os.getenv("GENAI_API_KEY")
-if not GENAI_API_KEY:
-    raise ValueError("GENAI_API_KEY not found in environment variables.")
+def _build_client():
+    # google-genai is slow to import, so it is only loaded when the first request needs it
+    from google import genai
+
+    # Load API key
+    api_key = os.getenv("GENAI_API_KEY")
+    if not api_key:
+        raise ValueError("GENAI_API_KEY not found in environment variables.")
+
+    # Initialize Gemini API Client
+    return genai.Client(api_key=api_key)
+
+client = LazyService(_build_client)
+
+def _wattage_prompt(appliance_name):
+    return f"What is the average wattage of a {appliance_name}? If the average wattage is a range, give me the modal wattage. If not available, give a single value representing the average wattage best. Return only a single numeric value (e.g., 700, 800) with no additional text or explanation."
+
+
+def _wattage_text(response):
+    # Ensure response is valid and contains text
+    if response and hasattr(response, "text") and response.text:
+        return response.text.strip()
+    else:
+        return "Error: Invalid response from Gemini API."
 
-# Initialize Gemini API Client
-client = genai.Client(api_key=GENAI_API_KEY)
 
-def get_appliance_wattage(appliance_name):
+def get_appliance_wattage(appliance_name, genai_client=None):
     """Fetch average wattage of an appliance using Gemini API."""
-    prompt = f"What is the average wattage of a {appliance_name}? If the average wattage is a range, give me the modal wattage. If not available, give a single value representing the average wattage best. Return only a single numeric value (e.g., 700, 800) with no additional text or explanation."
+    try:
+        genai_client = genai_client or client.get()
+        response = genai_client.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=_wattage_prompt(appliance_name)
+        )
+        return _wattage_text(response)
+
+    except Exception as e:
+        return f"Error: {str(e)}"
+
 
+async def aget_appliance_wattage(appliance_name, genai_client=None):
+    """Async variant of get_appliance_wattage using the client's native async API (client.aio)."""
     try:
-        response = client.models.generate_content(
+        genai_client = genai_client or client.get()
+        response = await genai_client.aio.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=_wattage_prompt(appliance_name)
+        )
+        return _wattage_text(response)
+
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+def get_appliance_wattages(appliance_names, genai_client=None):
+    """Fetch average wattages for several appliances with a single Gemini prompt.
+
+    Returns a dict mapping each requested name to its wattage text, or to an
+    "Error: ..." string when no value came back for it.
+    """
+    if not appliance_names:
+        return {}
+
+    names_json = json.dumps(list(appliance_names))
+    prompt = f"For each appliance in this JSON list, give the average wattage: {names_json}. If the average wattage is a range, give the modal wattage. If not available, give a single value representing the average wattage best. Return only a JSON object that maps each appliance name exactly as given to a single numeric value (e.g. {{\"Microwave\": 1000}}), with no additional text or explanation."
+
+    try:
+        genai_client = genai_client or client.get()
+        response = genai_client.models.generate_content(
             model="gemini-2.0-flash",
             contents=prompt
         )
 
-        # Ensure response is valid and contains text
-        if response and hasattr(response, "text") and response.text:
-            return response.text.strip()
-        else:
-            return "Error: Invalid response from Gemini API."
+        if not (response and hasattr(response, "text") and response.text):
+            return {name: "Error: Invalid response from Gemini API." for name in appliance_names}
+
+        # the model sometimes wraps JSON in a ```json fence
+        text = response.text.strip().strip("`").strip()
+        if text.lower().startswith("json"):
+            text = text[4:].strip()
+        values = json.loads(text)
+        if not isinstance(values, dict):
+            raise ValueError("expected a JSON object")
+
+        return {
+            name: str(values[name]).strip() if name in values else "Error: No value returned for this appliance."
+            for name in appliance_names
+        }
 
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return {name: f"Error: {str(e)}" for name in appliance_names}
\ No newline at end of file
@@ -0,0 +1,48 @@
+# gunicorn.conf.py -- production server: `gunicorn -c gunicorn.conf.py` or `python manage.py serve`
+
+import gc
+import os
+
+# before the app is imported, so settings.py picks the production profile
+os.environ.setdefault("DJANGO_ENV", "production")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+# tells AuthAppConfig.ready() not to start background threads in the master (see post_fork)
+os.environ["GUNICORN_PRELOAD_APP"] = "1"
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# "gthread" serves backend.wsgi; "uvicorn.workers.UvicornWorker" serves backend.asgi, where the async views don't hold a thread
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+wsgi_app = "backend.asgi:application" if "uvicorn" in worker_class.lower() else "backend.wsgi:application"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))  # a cold SARIMAX fit plus inference stays well below this
+graceful_timeout = 30
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))  # recycle workers after this many requests, 0 = never
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+# import Django and run MlPredictConfig.ready() (model, history, seasonal tables, statsmodels) once in the
+# master; forked workers share those pages copy-on-write instead of each loading their own copy
+preload_app = True
+
+
+def when_ready(server):
+    # move everything loaded so far out of the collector's reach, so collections in the workers
+    # don't write to (and un-share) the preloaded objects
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # connections opened while preloading belong to the master
+    from django.db import connections
+
+    connections.close_all()
+
+    # threads don't survive the fork; every worker runs its own outbox sender
+    from django.conf import settings
+
+    if getattr(settings, "EMAIL_OUTBOX_WORKER", True):
+        from auth_app.mail_queue import dispatcher
+
+        dispatcher.start()
@@ -0,0 +1,147 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger("instrumentation")
+
+# seconds; covers everything from a cached lookup to a cold SARIMAX fit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format."""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}  # sorted label items -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def summary(self):
+        """{label string: {"count", "sum", "mean"}}, handy for JSON output."""
+        out = {}
+        for key, series in self.snapshot().items():
+            count = series[len(self.buckets)]
+            out[_format_labels(key) or "total"] = {
+                "count": count,
+                "sum": round(series[-1], 6),
+                "mean": round(series[-1] / count, 6) if count else None,
+            }
+        return out
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.snapshot().items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', repr(bound)),))} {count}")
+            count = series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+stage_seconds = Histogram("prediction_stage_seconds", "Time spent in each stage of the prediction path.")
+request_seconds = Histogram("prediction_request_seconds", "End-to-end time of prediction requests.")
+
+HISTOGRAMS = [stage_seconds, request_seconds]
+
+
+def _log_level():
+    level = getattr(settings, "INSTRUMENTATION_SPAN_LOG_LEVEL", "DEBUG")
+    return logging.getLevelName(level) if isinstance(level, str) else level
+
+
+@contextmanager
+def span(stage, labels=None, **context):
+    """Time the block, record it in stage_seconds and log it.
+
+    ``labels`` become histogram labels and must have few distinct values
+    (e.g. a feature name); ``context`` such as row counts is only logged.
+    Errors are recorded too, with status="error", and re-raised.
+    """
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, labels=labels, status=status, **context)
+
+
+def record(stage, seconds, labels=None, status="ok", **context):
+    """Record a duration that was measured elsewhere, e.g. in a worker thread."""
+    stage_seconds.observe(seconds, stage=stage, status=status, **(labels or {}))
+    level = _log_level()
+    if logger.isEnabledFor(level):
+        extra = "".join(f" {name}={value}" for name, value in {**(labels or {}), **context}.items())
+        logger.log(level, "%s took %.2f ms status=%s%s", stage, seconds * 1000, status, extra)
+
+
+def timed_view(endpoint):
+    """Record each response's end-to-end time in request_seconds, labelled by endpoint and status."""
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                start = time.perf_counter()
+                response = await view(request, *args, **kwargs)
+                request_seconds.observe(time.perf_counter() - start, endpoint=endpoint, status=response.status_code)
+                return response
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            start = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            request_seconds.observe(time.perf_counter() - start, endpoint=endpoint, status=response.status_code)
+            return response
+        return wrapper
+    return decorator
+
+
+def render_prometheus():
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
+
+
+def reset():
+    for histogram in HISTOGRAMS:
+        histogram.reset()
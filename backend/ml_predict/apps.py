@@ -1,6 +1,57 @@
+import logging
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+def _is_management_command():
+    # manage.py commands other than runserver (migrate, shell, test...) don't serve predictions
+    return os.path.basename(sys.argv[0]) == "manage.py" and sys.argv[1:2] != ["runserver"]
+
+
+def preload():
+    """Load everything a prediction reads: the model, the history and its feature table, the seasonal tables.
+
+    Under gunicorn with preload_app (gunicorn.conf.py) this runs once in the
+    master, and the forked workers share the loaded objects copy-on-write.
+    """
+    from .ml.dataset import dataset
+    from .ml.features import feature_table_cache
+    from .ml.model_registry import registry
+    from .ml.seasonal import seasonal_index
+    try:
+        registry.get()
+        if getattr(settings, "ML_INFERENCE_BACKEND", "xgboost") == "numpy":
+            registry.ensemble()
+    except Exception as e:
+        logger.warning("model preload failed: %s", e)
+    try:
+        feature_table_cache.get(*dataset.snapshot())
+    except Exception as e:
+        logger.warning("dataset preload failed: %s", e)
+    seasonal_index.table()
+    if getattr(settings, "ML_PRELOAD_FORECASTING", False):
+        # about a second and a lot of module memory, paid once in the master instead of in every worker
+        import statsmodels.api  # noqa: F401
 
 
 class MlPredictConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ml_predict'
+
+    def ready(self):
+        # a typo in the engine name should stop the server, not turn every forecast into a 400
+        from .ml.forecast_engines import ENGINES
+        engine = getattr(settings, "ML_FORECAST_ENGINE", "sarimax")
+        if engine not in ENGINES:
+            raise ImproperlyConfigured(f"ML_FORECAST_ENGINE={engine!r} is not one of: {', '.join(ENGINES)}")
+
+        # warm the model once per process instead of once per request
+        if not getattr(settings, "ML_PRELOAD_MODEL", True) or _is_management_command():
+            return
+        preload()
@@ -0,0 +1,197 @@
+# ml_predict/benchmarks.py
+
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_history(rows, seed=0, end=None):
+    """A monthly history with the dataset's columns, ``rows`` months long.
+
+    With ``end`` = (year, month) the last row is that month, otherwise the
+    history starts in January 2000.
+    """
+    rng = np.random.default_rng(seed)
+    index = np.arange(rows)
+    start = 2000 * 12
+    if end is not None:
+        start = end[0] * 12 + end[1] - 1 - (rows - 1)
+    absolute = start + index
+    season = np.sin(index / 12 * 2 * np.pi)
+    return pd.DataFrame({
+        "Year": absolute // 12,
+        "Month": absolute % 12 + 1,
+        "Inflation Rate": np.round(rng.normal(3, 1, rows), 1),
+        "Total Bill": np.round(10 + 2 * season + rng.normal(0, 0.5, rows), 4),
+        "Generation Charge": np.round(rng.normal(6, 1, rows), 4),
+        "Avg_Temperature": np.round(28 + 2 * season + rng.normal(0, 0.3, rows), 1),
+    })
+
+
+def last_complete_month(today=None):
+    today = today or datetime.date.today()
+    return (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+
+
+def write_fixtures(directory, months=180, rate_years=10, trees=200, seed=0):
+    """Write a synthetic history CSV, pastRates.json and a trained model into ``directory``.
+
+    The history ends last month, so every forecast target is in the future.
+    Returns the paths as a dict with the ML_* setting names as keys.
+    """
+    from .ml.training import export_model, train_model
+
+    df = synthetic_history(months, seed=seed, end=last_complete_month())
+    dataset_path = os.path.join(directory, "history.csv")
+    df.to_csv(dataset_path, index=False)
+
+    rates = synthetic_history(rate_years * 12, seed=seed + 1, end=last_complete_month())
+    rates_path = os.path.join(directory, "pastRates.json")
+    with open(rates_path, "w") as f:
+        json.dump(rates[["Year", "Month", "Total Bill"]].to_dict(orient="records"), f)
+
+    model, report = train_model(df, params={"n_estimators": trees}, holdout=0)
+    model_path = os.path.join(directory, "model.ubj")
+    export_model(model, model_path, {"calibration_factor": 1.0}, report)
+
+    return {
+        "ML_DATASET_PATH": dataset_path,
+        "ML_PAST_RATES_PATH": rates_path,
+        "ML_MODEL_PATH": model_path,
+    }
+
+
+def shared_cache_settings(directory):
+    """CACHES with the shared alias in ``directory``, so benchmarks never touch the real shared cache."""
+    from django.conf import settings
+
+    return {
+        **settings.CACHES,
+        "shared": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.path.join(directory, "shared-cache"),
+        },
+    }
+
+
+def time_case(fn, setup=None, iterations=20, warmup=2):
+    """Run ``fn`` ``warmup`` + ``iterations`` times; ``setup`` runs untimed before each call.
+
+    Returns timing statistics in milliseconds.
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "min_ms": round(samples[0], 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "max_ms": round(samples[-1], 4),
+    }
+
+
+def environment():
+    """Where the numbers came from, so result files can be compared meaningfully."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def compare(baseline, current):
+    """Median change per case between two result files, as (case, old_ms, new_ms, ratio) rows."""
+    rows = []
+    for case, result in current["cases"].items():
+        old = baseline.get("cases", {}).get(case)
+        if old is None:
+            rows.append((case, None, result["median_ms"], None))
+            continue
+        ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else None
+        rows.append((case, old["median_ms"], result["median_ms"], ratio))
+    return rows
+
+
+class StubGradioClient:
+    """Stands in for gradio_client.Client; answers after ``latency`` seconds."""
+
+    latency = 0.0
+
+    def __init__(self, src):
+        pass
+
+    def _answer(self, appliance_info):
+        return f"Use the {appliance_info} less during peak hours."
+
+    def predict(self, appliance_info, api_name):
+        time.sleep(self.latency)
+        return self._answer(appliance_info)
+
+    def submit(self, appliance_info, api_name):
+        # like gradio's Job: a concurrent future, resolved without holding a thread meanwhile
+        job = concurrent.futures.Future()
+        timer = threading.Timer(self.latency, job.set_result, [self._answer(appliance_info)])
+        timer.daemon = True
+        timer.start()
+        return job
+
+
+def _wattage_response(contents):
+    if contents.startswith("For each"):
+        names = json.loads(contents[contents.index("["):contents.index("]") + 1])
+        return SimpleNamespace(text=json.dumps({name: 100 + i for i, name in enumerate(names)}))
+    return SimpleNamespace(text="700")
+
+
+class StubGenaiClient:
+    """Stands in for genai.Client: ``models`` and ``aio.models`` answer wattage prompts after ``latency`` seconds."""
+
+    latency = 0.0
+
+    def __init__(self):
+        client = self
+
+        class Models:
+            def generate_content(self, model, contents):
+                time.sleep(client.latency)
+                return _wattage_response(contents)
+
+        class AsyncModels:
+            async def generate_content(self, model, contents):
+                await asyncio.sleep(client.latency)
+                return _wattage_response(contents)
+
+        self.models = Models()
+        self.aio = SimpleNamespace(models=AsyncModels())
@@ -0,0 +1,191 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+import gemini_service
+from geminiApi import wattage
+from ml_predict import recommendation
+from ml_predict.benchmarks import StubGenaiClient, StubGradioClient, environment, shared_cache_settings, write_fixtures
+from ml_predict.ml.dataset import load_history
+from ml_predict.ml.feature_forecast import build_next_month_input, next_month_after
+from ml_predict.recommendation import RecommendationGateway
+
+
+def _request(scenario, i, target):
+    """(method, path, query, body) of the i-th request of a scenario; every request misses the caches."""
+    if scenario == "recommend":
+        body = json.dumps({"appliance_info": f"Aircon {i} {uuid.uuid4().hex[:8]}"}).encode()
+        return "POST", "/api/recommend/", "", body
+    if scenario == "wattage":
+        return "GET", "/wattdabork/get-wattage/", urlencode({"appliance": f"Appliance {i} {uuid.uuid4().hex[:8]}"}), b""
+    month, year = target
+    return "GET", "/api/predict/", urlencode({"month": month, "year": year}), b""
+
+
+def _summary(latencies, statuses, wall):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+        "statuses": dict(Counter(statuses)),
+    }
+
+
+def run_wsgi(handler, requests, threads):
+    """Drive the WSGI handler from ``threads`` threads, like a threaded WSGI worker."""
+    def call(request):
+        method, path, query, body = request
+        environ = {
+            "REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query,
+            "SERVER_NAME": "localhost", "SERVER_PORT": "80", "HTTP_HOST": "localhost",
+            "CONTENT_TYPE": "application/json", "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body), "wsgi.errors": sys.stderr, "wsgi.url_scheme": "http",
+            "wsgi.version": (1, 0), "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+        }
+        status = []
+        start = time.perf_counter()
+        result = handler(environ, lambda s, headers, exc_info=None: status.append(int(s.split()[0])))
+        b"".join(result)
+        if hasattr(result, "close"):
+            result.close()
+        return time.perf_counter() - start, status[0]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(call, requests))
+    wall = time.perf_counter() - start
+    return _summary([r[0] for r in results], [r[1] for r in results], wall)
+
+
+def run_asgi(application, requests, concurrency):
+    """Drive the ASGI application from one event loop with ``concurrency`` requests in flight."""
+    async def call(request, limit):
+        method, path, query, body = request
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": query.encode(), "root_path": "",
+            "headers": [(b"host", b"localhost"), (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 50000), "server": ("localhost", 80),
+        }
+        done = asyncio.Event()
+        status = []
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # the client stays connected until the response is complete
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                done.set()
+
+        async with limit:
+            start = time.perf_counter()
+            await application(scope, receive, send)
+            return time.perf_counter() - start, status[0]
+
+    async def main():
+        limit = asyncio.Semaphore(concurrency)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(call(request, limit) for request in requests))
+        return results, time.perf_counter() - start
+
+    results, wall = asyncio.run(main())
+    return _summary([r[0] for r in results], [r[1] for r in results], wall)
+
+
+class Command(BaseCommand):
+    help = ("Compare WSGI and ASGI throughput of the predict, recommendation and wattage endpoints "
+            "with stubbed remote backends.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+        parser.add_argument("--concurrency", type=int, default=100, help="requests in flight for ASGI")
+        parser.add_argument("--wsgi-threads", type=int, default=8, help="threads of the WSGI worker")
+        parser.add_argument("--stub-latency", type=float, default=0.2, help="seconds each stubbed remote call takes")
+        parser.add_argument("--scenarios", default="recommend,wattage,predict")
+        parser.add_argument("--output", help="write the JSON results to this file")
+
+    def handle(self, *args, **options):
+        StubGradioClient.latency = StubGenaiClient.latency = options["stub_latency"]
+        scenarios = [s.strip() for s in options["scenarios"].split(",") if s.strip()]
+        old_name = connection.settings_dict["NAME"]
+        directory = tempfile.mkdtemp()
+        # a file database: concurrent requests use several connections, which the
+        # shared in-memory test database can't serve without "table is locked" errors
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "bench.sqlite3")
+        connection.creation.create_test_db(verbosity=0)
+        gateway = recommendation.gateway
+        # the gateway's own limit would hide the server's; open it up to the benchmark's concurrency
+        recommendation.gateway = RecommendationGateway(
+            client_factory=StubGradioClient, concurrency=options["concurrency"], queue_size=options["requests"],
+        )
+        gemini_service.client.set(StubGenaiClient())
+        results = {}
+        try:
+            paths = write_fixtures(directory)
+            with override_settings(ML_SNAPSHOT_ENABLED=False, CACHES=shared_cache_settings(directory), **paths):
+                month, year = next_month_after(load_history().iloc[-1])
+                # warm the model and forecast cache, "predict" measures serving, not fitting
+                build_next_month_input(month, year)
+
+                wsgi, asgi = WSGIHandler(), ASGIHandler()
+                for scenario in scenarios:
+                    requests = [_request(scenario, i, (month, year)) for i in range(options["requests"])]
+                    results[scenario] = {
+                        "wsgi": run_wsgi(wsgi, requests, options["wsgi_threads"]),
+                    }
+                    requests = [_request(scenario, i, (month, year)) for i in range(options["requests"])]
+                    results[scenario]["asgi"] = run_asgi(asgi, requests, options["concurrency"])
+                    self.stderr.write(
+                        f"{scenario:<10} wsgi {results[scenario]['wsgi']['throughput_rps']:>8} req/s   "
+                        f"asgi {results[scenario]['asgi']['throughput_rps']:>8} req/s"
+                    )
+        finally:
+            recommendation.gateway = gateway
+            recommendation.recommendation_cache.clear()
+            gemini_service.client.reset()
+            wattage._memory_cache.clear()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(directory, ignore_errors=True)
+
+        output = json.dumps({
+            "environment": environment(),
+            "settings": {
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "wsgi_threads": options["wsgi_threads"],
+                "stub_latency": options["stub_latency"],
+            },
+            "scenarios": results,
+        }, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
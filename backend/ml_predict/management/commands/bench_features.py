@@ -0,0 +1,69 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from ml_predict.benchmarks import synthetic_history
+from ml_predict.ml.dataset import load_history
+from ml_predict.ml.features import HISTORY_FEATURES, LAG1_FEATURES, ROLLING3_FEATURES, compute_feature_table, training_matrix
+
+
+def scalar_features(df, i):
+    """The old hand-written way: features for row i from scalar lookups and tail(3)."""
+    prefix = df.iloc[:i]
+    last_row = prefix.iloc[-1]
+    roll3 = prefix.tail(3)
+    features = {name: last_row[source] for name, source in LAG1_FEATURES.items()}
+    features.update({name: roll3[source].mean() for name, source in ROLLING3_FEATURES.items()})
+    return features
+
+
+class Command(BaseCommand):
+    help = "Benchmark the vectorized feature pipeline against per-row scalar feature building."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000)
+        parser.add_argument("--scalar-sample", type=int, default=2000, help="rows timed with the scalar loop")
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        df = synthetic_history(options["rows"])
+
+        start = time.perf_counter()
+        table = compute_feature_table(df)
+        vectorized = time.perf_counter() - start
+
+        start = time.perf_counter()
+        X, y = training_matrix(df)
+        training = time.perf_counter() - start
+
+        sample = min(options["scalar_sample"], options["rows"] - 3)
+        start = time.perf_counter()
+        scalar_rows = [scalar_features(df, i) for i in range(3, 3 + sample)]
+        scalar = (time.perf_counter() - start) / sample * (options["rows"] - 3)
+
+        # both ways must agree, on the synthetic data and on the serving row for the real history
+        expected = pd.DataFrame(scalar_rows)[HISTORY_FEATURES].to_numpy()
+        synthetic_diff = float(np.abs(table[HISTORY_FEATURES].to_numpy()[3:3 + sample] - expected).max())
+        history = load_history()
+        serving = compute_feature_table(history).iloc[-1]
+        legacy = scalar_features(history, len(history))
+        serving_diff = max(abs(float(serving[name]) - float(legacy[name])) for name in HISTORY_FEATURES)
+
+        results = {
+            "rows": options["rows"],
+            "vectorized_seconds": round(vectorized, 4),
+            "training_matrix_seconds": round(training, 4),
+            "training_rows": int(len(y)),
+            "scalar_seconds_estimated": round(scalar, 2),
+            "speedup": round(scalar / vectorized, 1),
+            "max_abs_diff_synthetic": synthetic_diff,
+            "max_abs_diff_serving_row": serving_diff,
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, value in results.items():
+            self.stdout.write(f"{name:>26}: {value}")
@@ -0,0 +1,90 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ml_predict.benchmarks import synthetic_history
+from ml_predict.ml.dataset import load_history
+from ml_predict.ml.feature_forecast import FORECAST_FEATURES, forecast_paths
+from ml_predict.ml.forecast_cache import forecast_cache
+from ml_predict.ml.forecast_engines import ENGINES
+
+SYNTHETIC_COLUMNS = ["Total Bill", "Generation Charge", "Avg_Temperature", "Inflation Rate"]
+
+
+def synthetic_series(count, months):
+    """``count`` synthetic monthly series, cycling through the columns of synthetic histories."""
+    series = {}
+    for i in range(count):
+        history = synthetic_history(months, seed=i // len(SYNTHETIC_COLUMNS))
+        column = SYNTHETIC_COLUMNS[i % len(SYNTHETIC_COLUMNS)]
+        series[f"{column} #{i // len(SYNTHETIC_COLUMNS)}"] = history[column]
+    return series
+
+
+def path_diffs(expected, actual):
+    """Largest absolute and relative difference between two {name: path} dicts."""
+    abs_diff = max(float(np.abs(expected[name] - actual[name]).max()) for name in expected)
+    rel_diff = max(
+        float((np.abs(expected[name] - actual[name]) / np.maximum(np.abs(expected[name]), 1e-9)).max())
+        for name in expected
+    )
+    return abs_diff, rel_diff
+
+
+def timed_paths(series, periods, engine):
+    forecast_cache.invalidate()  # time fitting, not cache hits
+    # and not the shared cache either
+    with override_settings(SHARED_CACHE_ALIAS=None):
+        start = time.perf_counter()
+        paths = forecast_paths(series, periods, engine=engine)
+        return paths, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = ("Compare how long a forecasting engine and SARIMAX take to forecast the real history and a batch "
+            "of synthetic series, and how far their paths differ (parity is tested in ml_predict.tests).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--engine", default="ar1_lstsq", choices=[name for name in ENGINES if name != "sarimax"])
+        parser.add_argument("--series", type=int, default=40, help="synthetic series forecast in one batch")
+        parser.add_argument("--months", type=int, default=180, help="length of each synthetic series")
+        parser.add_argument("--horizon", type=int, default=24, help="months forecast per series")
+        parser.add_argument("--repeat", type=int, default=3, help="timed runs per engine, the fastest is reported")
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        engine, horizon = options["engine"], options["horizon"]
+        history = load_history()
+        batches = {
+            "history": {name: history[name] for name in FORECAST_FEATURES},
+            "synthetic": synthetic_series(options["series"], options["months"]),
+        }
+
+        results = {"engine": engine, "horizon": horizon, "batches": {}}
+        for batch, series in batches.items():
+            paths, timings = {}, {}
+            for name in ("sarimax", engine):
+                runs = [timed_paths(series, horizon, name) for _ in range(options["repeat"])]
+                paths[name] = runs[0][0]
+                timings[name] = min(seconds for _, seconds in runs)
+            abs_diff, rel_diff = path_diffs(paths["sarimax"], paths[engine])
+            results["batches"][batch] = {
+                "series": len(series),
+                "sarimax_seconds": round(timings["sarimax"], 4),
+                f"{engine}_seconds": round(timings[engine], 6),
+                "speedup": round(timings["sarimax"] / timings[engine], 1),
+                "max_abs_diff": abs_diff,
+                "max_rel_diff": rel_diff,
+            }
+        forecast_cache.invalidate()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for batch, result in results["batches"].items():
+                self.stdout.write(f"{batch}:")
+                for name, value in result.items():
+                    self.stdout.write(f"  {name:>18}: {value}")
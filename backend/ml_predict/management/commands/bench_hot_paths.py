@@ -0,0 +1,170 @@
+import json
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+import gemini_service
+from geminiApi import wattage
+from geminiApi.models import ApplianceWattage
+from ml_predict import recommendation
+from ml_predict.benchmarks import (
+    StubGenaiClient, StubGradioClient, compare, environment, shared_cache_settings, time_case, write_fixtures,
+)
+from ml_predict.ml.dataset import load_history
+from ml_predict.ml.feature_forecast import build_next_month_input, forecast_feature, next_month_after
+from ml_predict.ml.forecast_cache import forecast_cache
+from ml_predict.ml.forecast_engines import shared_forecasts
+from ml_predict.recommendation import RecommendationGateway
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the forecasting, prediction, recommendation and wattage hot paths on synthetic "
+            "fixtures with stubbed remote clients, and emit JSON results to diff between commits.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=180, help="rows in the synthetic history CSV")
+        parser.add_argument("--rate-years", type=int, default=10, help="years in the synthetic pastRates.json")
+        parser.add_argument("--trees", type=int, default=200, help="boosting rounds of the synthetic model")
+        parser.add_argument("--appliances", type=int, default=20, help="names per bulk wattage request")
+        parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds each stubbed remote call takes")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--cold-iterations", type=int, default=5, help="iterations for cases that refit SARIMAX")
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+        parser.add_argument("--output", help="write the JSON results to this file")
+        parser.add_argument("--compare", help="a previous JSON result file to compare medians against")
+
+    def handle(self, *args, **options):
+        StubGradioClient.latency = StubGenaiClient.latency = options["stub_latency"]
+        old_name = connection.settings_dict["NAME"]
+        # wattage lookups read and write ApplianceWattage, keep that away from the real database
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                paths = write_fixtures(directory, options["months"], options["rate_years"], options["trees"])
+                fixture_seconds = time.perf_counter() - start
+                with override_settings(ML_SNAPSHOT_ENABLED=False, CACHES=shared_cache_settings(directory), **paths):
+                    cases = self._run_cases(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results = {
+            "environment": environment(),
+            "fixtures": {
+                "months": options["months"],
+                "rate_years": options["rate_years"],
+                "trees": options["trees"],
+                "appliances": options["appliances"],
+                "stub_latency": options["stub_latency"],
+                "build_seconds": round(fixture_seconds, 3),
+            },
+            "cases": cases,
+        }
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+            self.stdout.write(f"\nmedian vs {options['compare']} ({baseline.get('environment', {}).get('commit')}):")
+            for case, old, new, ratio in compare(baseline, results):
+                change = f"{ratio:.2f}x" if ratio is not None else "new"
+                self.stdout.write(f"  {case:<38} {old if old is not None else '-':>10} -> {new:>10} ms  {change}")
+
+    def _run_cases(self, options):
+        df = load_history()
+        month, year = next_month_after(df.iloc[-1])
+        # a few months out, so the forecast is a multi-step one
+        target_month, target_year = (month + 2 - 1) % 12 + 1, year + (month + 2 - 1) // 12
+        client = Client()
+        names = [f"Appliance {i}" for i in range(options["appliances"])]
+
+        def predict():
+            response = client.get("/api/predict/", {"month": target_month, "year": target_year})
+            assert response.status_code == 200, response.content
+
+        def predict_range():
+            response = client.get("/api/predict/range/", {"from": f"{year}-{month:02d}", "to": f"{year + 1}-{month:02d}"})
+            assert response.status_code == 200, response.content
+
+        def recommend():
+            response = client.post("/api/recommend/", {"appliance_info": "Aircon 1.5HP, 8 hrs"}, content_type="application/json")
+            assert response.status_code == 200, response.content
+
+        def wattage_one():
+            response = client.get("/wattdabork/get-wattage/", {"appliance": "Microwave Oven"})
+            assert response.status_code == 200, response.content
+
+        def wattage_bulk():
+            response = client.post("/wattdabork/get-wattage/bulk/", {"appliances": names}, content_type="application/json")
+            assert response.status_code == 200, response.content
+
+        def clear_shared():
+            # one directory holds every namespace, this empties all of them
+            shared_forecasts.clear()
+
+        def cold_forecasts():
+            forecast_cache.invalidate()
+            clear_shared()
+
+        def clear_recommendations():
+            recommendation.recommendation_cache.clear()
+            clear_shared()
+
+        def clear_wattages():
+            wattage._memory_cache.clear()
+            clear_shared()
+            ApplianceWattage.objects.all().delete()
+
+        def clear_cached_wattages():
+            wattage._memory_cache.clear()
+            clear_shared()
+
+        cold = {"iterations": options["cold_iterations"], "warmup": min(options["warmup"], 1)}
+        warm = {"iterations": options["iterations"], "warmup": options["warmup"]}
+        cases = [
+            ("forecast_feature.cold", lambda: forecast_feature(df["Avg_Temperature"], periods=3), cold_forecasts, cold),
+            ("forecast_feature.shared_hit", lambda: forecast_feature(df["Avg_Temperature"], periods=3), forecast_cache.invalidate, warm),
+            ("forecast_feature.warm", lambda: forecast_feature(df["Avg_Temperature"], periods=3), None, warm),
+            ("build_next_month_input.cold", lambda: build_next_month_input(target_month, target_year), cold_forecasts, cold),
+            ("build_next_month_input.warm", lambda: build_next_month_input(target_month, target_year), None, warm),
+            ("predict_total_bill.cold", predict, cold_forecasts, cold),
+            ("predict_total_bill.warm", predict, clear_shared, warm),
+            ("predict_total_bill.shared_hit", predict, None, warm),
+            ("predict_total_bill_range.warm", predict_range, None, warm),
+            ("get_energy_recommendation.miss", recommend, clear_recommendations, warm),
+            ("get_energy_recommendation.shared_hit", recommend, recommendation.recommendation_cache.clear, warm),
+            ("get_energy_recommendation.hit", recommend, None, warm),
+            ("fetch_appliance_wattage.miss", wattage_one, clear_wattages, warm),
+            ("fetch_appliance_wattage.db_hit", wattage_one, clear_cached_wattages, warm),
+            ("fetch_appliance_wattage.shared_hit", wattage_one, wattage._memory_cache.clear, warm),
+            ("fetch_appliance_wattage.hit", wattage_one, None, warm),
+            ("fetch_appliance_wattages.miss", wattage_bulk, clear_wattages, warm),
+            ("fetch_appliance_wattages.shared_hit", wattage_bulk, wattage._memory_cache.clear, warm),
+            ("fetch_appliance_wattages.hit", wattage_bulk, None, warm),
+        ]
+
+        gateway = recommendation.gateway
+        recommendation.gateway = RecommendationGateway(client_factory=StubGradioClient)
+        gemini_service.client.set(StubGenaiClient())
+        results = {}
+        try:
+            for name, fn, setup, runs in cases:
+                if options["filter"] not in name:
+                    continue
+                results[name] = time_case(fn, setup=setup, **runs)
+                self.stderr.write(f"{name:<38} median {results[name]['median_ms']:.3f} ms")
+        finally:
+            recommendation.gateway = gateway
+            recommendation.recommendation_cache.clear()
+            gemini_service.client.reset()
+            wattage._memory_cache.clear()
+            forecast_cache.invalidate()
+        return results
@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from ml_predict.benchmarks import synthetic_history, time_case
+from ml_predict.ml.dataset import load_history
+from ml_predict.ml.features import MODEL_FEATURES, training_matrix
+from ml_predict.ml.model_registry import load_model_file, registry
+from ml_predict.ml.prediction import predict_raw
+from ml_predict.ml.tree_inference import FlatTreeEnsemble
+
+
+def parity_rows(rows, seed=0):
+    """Feature rows to compare the backends on: the real history, synthetic rows and rows with missing values."""
+    history, _ = training_matrix(load_history())
+    synthetic, _ = training_matrix(synthetic_history(rows, seed=seed))
+    missing = synthetic[: max(1, rows // 10)].copy()
+    rng = np.random.default_rng(seed)
+    missing[rng.random(missing.shape) < 0.2] = np.nan
+    return {"history": history, "synthetic": synthetic, "missing": missing}
+
+
+class Command(BaseCommand):
+    help = ("Check that the NumPy tree-walking inference backend matches XGBoost and compare "
+            "their per-row prediction latency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", help="model file to check, the serving model by default")
+        parser.add_argument("--rows", type=int, default=2000, help="synthetic rows in the parity check")
+        parser.add_argument("--iterations", type=int, default=500)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--tolerance", type=float, default=0.0, help="largest absolute difference accepted")
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        model = load_model_file(options["model"]) if options["model"] else registry.get()
+        flatten = time_case(lambda: FlatTreeEnsemble.from_booster(model), iterations=3, warmup=0)
+        ensemble = FlatTreeEnsemble.from_booster(model)
+
+        parity = {}
+        rows = parity_rows(options["rows"])
+        for name, X in rows.items():
+            diff = np.abs(model.predict(X) - ensemble.predict(X))
+            parity[name] = {"rows": len(X), "max_abs_diff": float(np.nanmax(diff)), "mismatched_rows": int((diff > 0).sum())}
+
+        row = rows["history"][-1:]
+        inputs = [dict(zip(MODEL_FEATURES, row[0].tolist()))]
+        runs = {"iterations": options["iterations"], "warmup": options["warmup"]}
+        latency = {
+            "xgboost.predict": time_case(lambda: model.predict(row), **runs),
+            "numpy.predict": time_case(lambda: ensemble.predict(row), **runs),
+        }
+        if not options["model"]:
+            # the whole predict_raw step, input dict to raw output, as the views call it
+            for backend in ("xgboost", "numpy"):
+                with override_settings(ML_INFERENCE_BACKEND=backend):
+                    latency[f"predict_raw[{backend}]"] = time_case(lambda: predict_raw(inputs), **runs)
+
+        results = {
+            "model": str(options["model"] or registry.path),
+            "trees": ensemble.num_trees,
+            "max_depth": ensemble.max_depth,
+            "nodes": len(ensemble.left),
+            "flatten_ms": flatten["median_ms"],
+            "parity": parity,
+            "latency": latency,
+            "speedup": round(latency["xgboost.predict"]["median_ms"] / latency["numpy.predict"]["median_ms"], 1),
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for name in ("model", "trees", "max_depth", "nodes", "flatten_ms", "speedup"):
+                self.stdout.write(f"{name:>24}: {results[name]}")
+            for name, result in parity.items():
+                self.stdout.write(f"{'parity ' + name:>24}: max abs diff {result['max_abs_diff']} over {result['rows']} rows")
+            for name, result in latency.items():
+                self.stdout.write(f"{name:>24}: median {result['median_ms']:.4f} ms  p95 {result['p95_ms']:.4f} ms")
+
+        worst = max(result["max_abs_diff"] for result in parity.values())
+        if worst > options["tolerance"]:
+            raise CommandError(f"the NumPy backend differs from XGBoost by up to {worst} (tolerance {options['tolerance']})")
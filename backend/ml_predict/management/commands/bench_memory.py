@@ -0,0 +1,153 @@
+import argparse
+import gc
+import json
+import os
+import signal
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_predict.benchmarks import environment
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid):
+    """Memory of a process in MB, from /proc/<pid>/smaps_rollup (Linux 4.14+)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB" and parts[0].rstrip(":") in SMAPS_FIELDS:
+                fields[parts[0].rstrip(":")] = round(int(parts[1]) / 1024, 1)
+    return fields
+
+
+def _load_serving_state():
+    from ml_predict.apps import preload
+
+    preload()
+    import statsmodels.api  # noqa: F401  what ML_PRELOAD_FORECASTING does in production
+
+
+def _serve_one_prediction():
+    # touch what a request touches: history, a forecast, the model and the seasonal tables
+    from ml_predict.ml.dataset import load_history
+    from ml_predict.ml.feature_forecast import build_next_month_input, next_month_after
+    from ml_predict.ml.prediction import predict_inputs
+
+    month, year = next_month_after(load_history().iloc[-1])
+    predict_inputs([build_next_month_input(month, year)])
+
+
+def run_group(workers, preload):
+    """Fork ``workers`` processes the way gunicorn does and measure the whole group.
+
+    With ``preload`` the serving state is loaded in the master before the
+    fork (gunicorn's preload_app); otherwise every worker loads its own.
+    Each worker serves one prediction before it's measured.
+    """
+    if preload:
+        _load_serving_state()
+        gc.freeze()  # gunicorn.conf.py does this in when_ready
+
+    ready_read, ready_write = os.pipe()
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            try:
+                if not preload:
+                    _load_serving_state()
+                _serve_one_prediction()
+                os.write(ready_write, b"r")
+                signal.pause()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    os.close(ready_write)
+
+    try:
+        ready = 0
+        while ready < workers:
+            chunk = os.read(ready_read, workers)
+            if not chunk:
+                raise RuntimeError("a worker exited before it was ready")
+            ready += len(chunk)
+        master = smaps_rollup(os.getpid())
+        measured = [smaps_rollup(pid) for pid in children]
+    finally:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        for pid in children:
+            os.waitpid(pid, 0)
+
+    return {
+        "workers": workers,
+        "preload": preload,
+        "master": master,
+        "worker_mean": {name: round(sum(m[name] for m in measured) / workers, 1) for name in SMAPS_FIELDS},
+        # PSS splits shared pages between the processes sharing them, so it adds up to the real footprint
+        "total_pss_mb": round(master["Pss"] + sum(m["Pss"] for m in measured), 1),
+        "total_rss_mb": round(master["Rss"] + sum(m["Rss"] for m in measured), 1),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Compare the memory footprint (PSS) of 1 and N forked workers, with the serving state "
+            "preloaded in the master as gunicorn.conf.py does and loaded per worker.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="N in the 1 vs N comparison")
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+        # used by the command itself to measure each configuration in a fresh process
+        parser.add_argument("--group", type=int, help=argparse.SUPPRESS)
+        parser.add_argument("--preload", action="store_true", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if not os.path.exists(f"/proc/{os.getpid()}/smaps_rollup"):
+            raise CommandError("/proc/<pid>/smaps_rollup is not available, memory can only be measured on Linux.")
+        if options["group"]:
+            self.stdout.write(json.dumps(run_group(options["group"], options["preload"])))
+            return
+
+        # no DEBUG query log, no writes to the real shared cache
+        env = dict(os.environ, DJANGO_DEBUG="0", SHARED_CACHE_ALIAS="", ML_PRELOAD_MODEL="0")
+        groups = []
+        for preload in (True, False):
+            for workers in sorted({1, options["workers"]}):
+                command = [sys.executable, "manage.py", "bench_memory", "--skip-checks", "--group", str(workers)]
+                if preload:
+                    command.append("--preload")
+                proc = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+                if proc.returncode != 0:
+                    raise CommandError(proc.stderr[-2000:])
+                groups.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+        summary = {}
+        for preload in (True, False):
+            one, many = [next(g for g in groups if g["preload"] == preload and g["workers"] == n)
+                         for n in (1, options["workers"])]
+            extra = max(options["workers"] - 1, 1)
+            summary["preload" if preload else "per_worker_load"] = {
+                "total_pss_mb_1": one["total_pss_mb"],
+                f"total_pss_mb_{options['workers']}": many["total_pss_mb"],
+                "pss_mb_per_extra_worker": round((many["total_pss_mb"] - one["total_pss_mb"]) / extra, 1),
+            }
+        results = {"environment": environment(), "summary": summary, "groups": groups}
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'mode':<16} {'workers':>7} {'total PSS MB':>13} {'total RSS MB':>13} {'worker PSS MB':>14} {'worker shared MB':>17}")
+        for g in groups:
+            shared = g["worker_mean"]["Shared_Clean"] + g["worker_mean"]["Shared_Dirty"]
+            self.stdout.write(
+                f"{'preload' if g['preload'] else 'per-worker load':<16} {g['workers']:>7} {g['total_pss_mb']:>13} "
+                f"{g['total_rss_mb']:>13} {g['worker_mean']['Pss']:>14} {round(shared, 1):>17}"
+            )
+        for mode, result in summary.items():
+            self.stdout.write(f"{mode}: {result}")
@@ -0,0 +1,88 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# what a worker does before it can serve: set up Django and import every view through the URLconf
+STARTUP_SNIPPET = (
+    "import os, django; "
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings'); "
+    "django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+def _parse_importtime(stderr):
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue  # header line
+        name = parts[2]
+        if not name.startswith("  "):
+            top_level.append((name.strip(), cumulative))
+    return top_level
+
+
+class Command(BaseCommand):
+    help = "Measure cold start time of the backend project (Django setup + URLconf/view imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+        parser.add_argument("--preload", action="store_true", help="also preload the ML model as a server would")
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, ML_PRELOAD_MODEL="1" if options["preload"] else "0")
+        # with -c, sys.argv[0] is "-c", so MlPredictConfig treats the child like a server process
+        command = [sys.executable, "-X", "importtime", "-c", STARTUP_SNIPPET]
+
+        wall_times = []
+        imports = {}
+        for _ in range(options["runs"]):
+            start = time.perf_counter()
+            proc = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+            wall_times.append(time.perf_counter() - start)
+            if proc.returncode != 0:
+                self.stderr.write(proc.stderr[-2000:])
+                raise SystemExit(proc.returncode)
+            for name, cumulative in _parse_importtime(proc.stderr):
+                imports.setdefault(name, []).append(cumulative)
+
+        slowest = sorted(
+            ((name, statistics.median(times) / 1e6) for name, times in imports.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:options["top"]]
+
+        result = {
+            "runs": options["runs"],
+            "preload": options["preload"],
+            "wall_seconds": {
+                "median": round(statistics.median(wall_times), 4),
+                "min": round(min(wall_times), 4),
+                "max": round(max(wall_times), 4),
+            },
+            "slowest_imports": [{"module": name, "seconds": round(seconds, 4)} for name, seconds in slowest],
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        wall = result["wall_seconds"]
+        self.stdout.write(f"startup over {options['runs']} runs: median {wall['median']:.3f}s "
+                          f"(min {wall['min']:.3f}s, max {wall['max']:.3f}s)")
+        for item in result["slowest_imports"]:
+            self.stdout.write(f"  {item['seconds']:.3f}s  {item['module']}")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_predict.snapshots import build_snapshots, source_version
+
+
+class Command(BaseCommand):
+    help = "Precompute /api/predict/ responses for the next N months (rerun after the model or data changes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=12)
+
+    def handle(self, *args, **options):
+        try:
+            written = build_snapshots(months=options["months"])
+        except RuntimeError as e:
+            raise CommandError(f"{e} Rerun to try the fits again.")
+        months = ", ".join(f"{year}-{month:02d}" for year, month in written)
+        self.stdout.write(f"wrote {len(written)} snapshot(s) for {source_version()}: {months}")
@@ -0,0 +1,35 @@
+import importlib.util
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Run the production server: gunicorn with gunicorn.conf.py, preloaded models and DEBUG off."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bind", help="address to listen on (GUNICORN_BIND, default 0.0.0.0:8000)")
+        parser.add_argument("--workers", type=int, help="worker processes (GUNICORN_WORKERS, default 2)")
+        parser.add_argument("--threads", type=int, help="threads per worker (GUNICORN_THREADS, default 4)")
+        parser.add_argument("--asgi", action="store_true", help="serve backend.asgi with uvicorn workers")
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec("gunicorn") is None:
+            raise CommandError("gunicorn is not installed (pip install gunicorn).")
+        if options["asgi"] and importlib.util.find_spec("uvicorn") is None:
+            raise CommandError("uvicorn is not installed (pip install uvicorn).")
+
+        env = dict(os.environ, DJANGO_ENV="production")
+        for option, name in (("bind", "GUNICORN_BIND"), ("workers", "GUNICORN_WORKERS"), ("threads", "GUNICORN_THREADS")):
+            if options[option] is not None:
+                env[name] = str(options[option])
+        if options["asgi"]:
+            env["GUNICORN_WORKER_CLASS"] = "uvicorn.workers.UvicornWorker"
+
+        # settings are already loaded in this process with the development profile,
+        # so gunicorn starts fresh and loads the app once, in its master
+        config = os.path.join(settings.BASE_DIR, "gunicorn.conf.py")
+        os.chdir(settings.BASE_DIR)
+        os.execve(sys.executable, [sys.executable, "-m", "gunicorn", "-c", config], env)
@@ -0,0 +1,56 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_predict.ml.dataset import load_history
+from ml_predict.ml.prediction import ACTUAL_APP_PREDICTION, EXPECTED_COLAB_PREDICTION
+from ml_predict.ml.training import DEFAULT_PARAMS, export_model, metadata_path, train_model
+
+
+class Command(BaseCommand):
+    help = "Train the Total Bill XGBoost model from the monthly dataset and save it in XGBoost's native format."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=None, help="model path ending in .json or .ubj (default: ML_TRAIN_OUTPUT_PATH)")
+        parser.add_argument("--nthread", type=int, default=None, help="CPU threads for training (default: ML_TRAIN_NTHREAD, 0 = all cores)")
+        parser.add_argument("--holdout", type=int, default=12, help="trailing months scored before the final fit")
+        parser.add_argument("--n-estimators", type=int, default=DEFAULT_PARAMS["n_estimators"])
+        parser.add_argument("--learning-rate", type=float, default=DEFAULT_PARAMS["learning_rate"])
+        parser.add_argument("--max-depth", type=int, default=DEFAULT_PARAMS["max_depth"])
+        parser.add_argument("--calibration-factor", type=float, default=None,
+                            help="stored in the metadata; defaults to the app's current Colab/app ratio")
+        parser.add_argument("--json", action="store_true", help="print the training report as JSON")
+
+    def handle(self, *args, **options):
+        output = str(options["output"] or getattr(settings, "ML_TRAIN_OUTPUT_PATH"))
+        nthread = options["nthread"] if options["nthread"] is not None else getattr(settings, "ML_TRAIN_NTHREAD", 0)
+        params = {
+            "n_estimators": options["n_estimators"],
+            "learning_rate": options["learning_rate"],
+            "max_depth": options["max_depth"],
+        }
+
+        calibration = {
+            "expected_colab_prediction": EXPECTED_COLAB_PREDICTION,
+            "actual_app_prediction": ACTUAL_APP_PREDICTION,
+            "calibration_factor": EXPECTED_COLAB_PREDICTION / ACTUAL_APP_PREDICTION,
+        }
+        if options["calibration_factor"] is not None:
+            calibration["calibration_factor"] = options["calibration_factor"]
+
+        try:
+            model, report = train_model(load_history(), params=params, nthread=nthread, holdout=options["holdout"])
+            metadata = export_model(model, output, calibration, report)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options["json"]:
+            self.stdout.write(json.dumps({"model": output, "metadata": metadata}, indent=2))
+            return
+        self.stdout.write(f"trained on {report['rows']} months in {report['fit_seconds']}s (nthread={nthread})")
+        if "holdout_metrics" in report:
+            self.stdout.write(f"last {report['holdout']} months: {report['holdout_metrics']}")
+        self.stdout.write(f"saved {output}")
+        self.stdout.write(f"saved {metadata_path(output)}")
+        self.stdout.write("point ML_MODEL_PATH at the model to serve it")
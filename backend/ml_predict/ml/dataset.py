@@ -0,0 +1,146 @@
+# ml_predict/ml/dataset.py
+
+import os
+import threading
+
+import pandas as pd
+from django.conf import settings
+
+from instrumentation import span
+
+REQUIRED_COLUMNS = ["Year", "Month", "Inflation Rate", "Generation Charge", "Avg_Temperature", "Total Bill"]
+
+DTYPES = {
+    "Year": "int64",
+    "Month": "int64",
+    "Inflation Rate": "float64",
+    "Generation Charge": "float64",
+    "Avg_Temperature": "float64",
+    "Total Bill": "float64",
+}
+
+
+def default_dataset_path():
+    return getattr(
+        settings,
+        "ML_DATASET_PATH",
+        os.path.join(settings.BASE_DIR, "data", "enhanced_kWh_800_edited_records.csv"),
+    )
+
+
+def _prepare(df):
+    # Ensure no missing values in key columns
+    df = df.dropna(subset=REQUIRED_COLUMNS)
+    df = df.astype(DTYPES)
+    df = df.sort_values(["Year", "Month"]).reset_index(drop=True)
+    df["Date"] = pd.to_datetime(pd.DataFrame({"year": df["Year"], "month": df["Month"], "day": 1}))
+    return df.set_index("Date", drop=False)
+
+
+class HistoricalDataset:
+    """Parsed, sorted and date-indexed copy of the monthly history CSV.
+
+    The CSV is parsed once and only re-read when its mtime or size changes.
+    Callers get the cached frame back and must treat it as read-only.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._df = None
+        self._stat = None
+        self.version = 0  # bumped every time the frame changes
+        self._snapshot = None  # (frame, version), replaced as one object so readers never mix the two
+        self._listeners = []
+
+    def on_change(self, callback):
+        """Register a callable that is run whenever the cached frame changes."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def _changed(self):
+        self.version += 1
+        self._snapshot = (self._df, self.version)
+        for callback in self._listeners:
+            callback()
+
+    @property
+    def path(self):
+        return self._path or default_dataset_path()
+
+    def _current_stat(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def frame(self):
+        return self.snapshot()[0]
+
+    def snapshot(self):
+        """(frame, version) read together, for caches keyed on the version."""
+        stat = self._current_stat()
+        snapshot = self._snapshot
+        if snapshot is not None and stat == self._stat:
+            return snapshot
+
+        with self._lock:
+            self._load_locked()
+            return self._snapshot
+
+    def _load_locked(self):
+        # caller holds self._lock
+        stat = self._current_stat()
+        if self._df is None or stat != self._stat:
+            with span("csv_load"):
+                self._df = _prepare(pd.read_csv(self.path))
+            self._stat = stat
+            self._changed()
+        return self._df
+
+    def append(self, rows, persist=True):
+        """Add new monthly rows without re-parsing the whole CSV.
+
+        ``rows`` is a list of dicts with the REQUIRED_COLUMNS keys. Rows for a
+        month that is already in the history are rejected.
+        """
+        new = pd.DataFrame(rows)
+        missing = [c for c in REQUIRED_COLUMNS if c not in new.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+        with self._lock:
+            # read under the lock, so a concurrent append can't be dropped from the frame
+            current = self._load_locked()
+            new = _prepare(new[REQUIRED_COLUMNS])
+            if new.index.isin(current.index).any() or new.index.has_duplicates:
+                raise ValueError("Rows for an existing month cannot be appended.")
+
+            if persist:
+                # keep the CSV's own column order so the file stays readable by pd.read_csv
+                header = pd.read_csv(self.path, nrows=0).columns
+                out = new.reindex(columns=header)
+                needs_newline = False
+                with open(self.path, "rb") as f:
+                    f.seek(0, os.SEEK_END)
+                    if f.tell():
+                        f.seek(-1, os.SEEK_END)
+                        needs_newline = f.read(1) != b"\n"
+                with open(self.path, "a", newline="") as f:
+                    if needs_newline:
+                        f.write("\n")
+                    out.to_csv(f, header=False, index=False)
+
+            combined = pd.concat([current, new])
+            if not combined.index.is_monotonic_increasing:
+                combined = combined.sort_index()
+            self._df = combined
+            if persist:
+                self._stat = self._current_stat()
+            self._changed()
+            return self._df
+
+
+dataset = HistoricalDataset()
+
+
+def load_history():
+    return dataset.frame()
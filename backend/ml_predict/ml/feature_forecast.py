@@ -1,35 +1,110 @@
 # geminiApi/ml/feature_forecast.py
 
-import pandas as pd
+import logging
 import numpy as np
-import statsmodels.api as sm
-import os
 import warnings
 from datetime import datetime
 
+from django.conf import settings
+
+from .dataset import dataset
+from .features import HISTORY_FEATURES, feature_table_cache, season_flags
+from .forecast_cache import forecast_cache
+from .forecast_engines import get_engine, seasonal_naive_path
+
+# fitted models are only valid for the history they were fitted on
+dataset.on_change(forecast_cache.invalidate)
+
+logger = logging.getLogger(__name__)
+
 warnings.filterwarnings("ignore")  # Optional: hide SARIMA warnings
 
+def forecast_paths(series_by_name, periods=1, engine=None, fallbacks=None):
+    """Forecast several independent series, ``periods`` steps each.
+
+    ``engine`` names a forecasting engine (see forecast_engines), by default
+    the one ML_FORECAST_ENGINE selects. Returns {name: numpy array of length
+    ``periods``}. Names whose path (partly) came from the seasonal naive
+    fallback are added to the ``fallbacks`` set, if one is given, so callers
+    can avoid caching a result a retry would improve.
+    """
+    paths = get_engine(engine).forecast_paths(series_by_name, periods)
+
+    result = {}
+    for name, path in paths.items():
+        path = np.asarray(path[:periods], dtype="float64")
+        # a failed, timed out or diverged fit gives NaN for some steps, fill those from the fallback
+        missing = np.isnan(path)
+        if missing.any():
+            path = np.where(missing, seasonal_naive_path(series_by_name[name], periods), path)
+            if fallbacks is not None:
+                fallbacks.add(name)
+        result[name] = path
+    return result
+
+
+def forecast_path(series, periods=1):
+    """Forecast ``periods`` steps ahead and return the whole path as a numpy array."""
+    return forecast_paths({"series": series}, periods=periods)["series"]
+
+
 def forecast_feature(series, periods=1):
-    try:
-        model = sm.tsa.SARIMAX(series, order=(1, 0, 0), seasonal_order=(0, 1, 0, 12), enforce_stationarity=False, enforce_invertibility=False)
-        model_fit = model.fit(disp=False)
-        forecast = model_fit.forecast(steps=periods)
-        result = forecast.iloc[-1]
-        return round(float(result), 4) if not pd.isna(result) else 0.0
-    except Exception as e:
-        print(f"[SARIMAX ERROR] {e}")
-        return 0.0
+    return round(float(forecast_path(series, periods=periods)[-1]), 4)
+
+
+def forecast_feature_path(series, periods=1):
+    """Multi-step version of forecast_feature: one fit, every month up to ``periods``."""
+    return [round(float(v), 4) for v in forecast_path(series, periods=periods)]
+
+
+FORECAST_FEATURES = ["Inflation Rate", "Generation Charge", "Avg_Temperature"]
+
+def next_month_after(last_row):
+    next_month = int(last_row["Month"] % 12) + 1
+    next_year = int(last_row["Year"]) + (1 if next_month == 1 else 0)
+    return next_month, next_year
+
+
+def months_ahead(last_row, month, year):
+    current_date = datetime(int(last_row["Year"]), int(last_row["Month"]), 1)
+    target_date = datetime(year, month, 1)
+    return ((target_date.year - current_date.year) * 12 + target_date.month - current_date.month)
 
 
-def build_next_month_input(target_month=None, target_year=None):
-    path = os.path.join("data", "enhanced_kWh_800_edited_records.csv")
-    df = pd.read_csv(path)
+def check_months_ahead(periods_ahead):
+    # every month ahead is another forecast step, computed and cached per feature
+    max_ahead = getattr(settings, "ML_PREDICT_MAX_MONTHS_AHEAD", 36)
+    if periods_ahead > max_ahead:
+        raise ValueError(f"Can't forecast more than {max_ahead} months past the last month of history.")
 
-    # Ensure no missing values in key columns
-    df = df.dropna(subset=["Year", "Month", "Inflation Rate", "Generation Charge", "Avg_Temperature", "Total Bill"])
 
-    df = df.sort_values(["Year", "Month"]).reset_index(drop=True)
-    df["Date"] = pd.to_datetime(df["Year"].astype(str) + "-" + df["Month"].astype(str) + "-01")
+def _history_features(df, version):
+    # lag/rolling features for the month after the history, from the shared feature pipeline
+    next_row = feature_table_cache.get(df, version).iloc[-1]
+    return {name: float(next_row[name]) for name in HISTORY_FEATURES}
+
+
+def _input_row(month, forecasts, history_features):
+    flags = season_flags(month)
+    return {
+        "Month": month,
+        "Inflation Rate": forecasts["Inflation Rate"],
+        "Generation Charge": forecasts["Generation Charge"],
+        "Avg_Temperature": forecasts["Avg_Temperature"],
+        **history_features,
+        "Is_Hot_Season": int(flags["Is_Hot_Season"]),
+        "Is_Cold_Season": int(flags["Is_Cold_Season"]),
+    }
+
+
+def build_next_month_input(target_month=None, target_year=None, fallbacks=None):
+    """Model input for the target month (by default the month after the history).
+
+    Features forecast with the fallback are added to ``fallbacks`` (see forecast_paths).
+    """
+    # cleaned, sorted and date-indexed history (parsed once, re-read only when the CSV changes),
+    # with the version it belongs to so the feature table is cached under the right one
+    df, version = dataset.snapshot()
 
     # Get last row for reference
     last_row = df.iloc[-1]
@@ -37,59 +112,61 @@ def build_next_month_input(target_month=None, target_year=None):
     # Calculate target month and year
     if target_month is None or target_year is None:
         # Default: predict next month
-        next_month = (last_row["Month"] % 12) + 1
-        next_year = last_row["Year"] + (1 if next_month == 1 else 0)
+        next_month, next_year = next_month_after(last_row)
     else:
         # Use provided target month and year
         next_month = target_month
         next_year = target_year
         
-    print(f"Forecasting for Month: {next_month}, Year: {next_year}")
+    logger.debug("Forecasting for Month: %s, Year: %s", next_month, next_year)
     
     # Calculate how many periods to forecast ahead
-    current_date = datetime(int(last_row["Year"]), int(last_row["Month"]), 1)
-    target_date = datetime(next_year, next_month, 1)
-    periods_ahead = ((target_date.year - current_date.year) * 12 + target_date.month - current_date.month)
+    periods_ahead = months_ahead(last_row, next_month, next_year)
     
-    if periods_ahead < 0:
+    if periods_ahead < 1:
         # Don't allow predicting in the past
-        print("Warning: Can't forecast for past dates. Using next month instead.")
-        next_month = (last_row["Month"] % 12) + 1
-        next_year = last_row["Year"] + (1 if next_month == 1 else 0)
+        logger.warning("Can't forecast for past dates. Using next month instead.")
+        next_month, next_year = next_month_after(last_row)
         periods_ahead = 1
+    check_months_ahead(periods_ahead)
     
-    print(f"Forecasting {periods_ahead} periods ahead")
+    logger.debug("Forecasting %s periods ahead", periods_ahead)
     
     # Forecast future features
-    inflation_pred = forecast_feature(df["Inflation Rate"], periods=periods_ahead)
-    gen_charge_pred = forecast_feature(df["Generation Charge"], periods=periods_ahead)
-    temp_pred = forecast_feature(df["Avg_Temperature"], periods=periods_ahead)
-
-    # Get lag features from the most recent data
-    lag1_bill = last_row["Total Bill"]
-    lag1_gen = last_row["Generation Charge"]
-    lag1_infl = last_row["Inflation Rate"]
-    lag1_temp = last_row["Avg_Temperature"]
-
-    roll3 = df.tail(3)
-    bill_roll3 = roll3["Total Bill"].mean()
-    gen_roll3 = roll3["Generation Charge"].mean()
-    infl_roll3 = roll3["Inflation Rate"].mean()
-    temp_roll3 = roll3["Avg_Temperature"].mean()
+    # the three feature models are independent, fit them concurrently
+    paths = forecast_paths({name: df[name] for name in FORECAST_FEATURES}, periods=periods_ahead, fallbacks=fallbacks)
+    forecasts = {name: round(float(paths[name][-1]), 4) for name in FORECAST_FEATURES}
 
-    return {
-        "Month": next_month,
-        "Inflation Rate": inflation_pred,
-        "Generation Charge": gen_charge_pred,
-        "Avg_Temperature": temp_pred,
-        "Total_Bill_Lag1": lag1_bill,
-        "Generation_Charge_Lag1": lag1_gen,
-        "Inflation_Lag1": lag1_infl,
-        "Avg_Temp_Lag1": lag1_temp,
-        "Total_Bill_Rolling3": bill_roll3,
-        "Gen_Charge_Rolling3": gen_roll3,
-        "Inflation_Rolling3": infl_roll3,
-        "Temp_Rolling3": temp_roll3,
-        "Is_Hot_Season": int(next_month in [4, 5]),
-        "Is_Cold_Season": int(next_month in [12, 1, 2])
-    }
+    return _input_row(next_month, forecasts, _history_features(df, version))
+
+
+def build_input_range(start_month, start_year, end_month, end_year, fallbacks=None):
+    """Build one model input per month from start to end (inclusive).
+
+    Each feature model is fitted once and its forecast path is reused for
+    every month, instead of a refit per target month. Returns a list of
+    (year, input_data) tuples; features forecast with the fallback are added
+    to ``fallbacks`` (see forecast_paths).
+    """
+    df, version = dataset.snapshot()
+    last_row = df.iloc[-1]
+
+    first = months_ahead(last_row, start_month, start_year)
+    last = months_ahead(last_row, end_month, end_year)
+    if first < 1:
+        raise ValueError("Can't forecast for past dates.")
+    if last < first:
+        raise ValueError("End month must not be before start month.")
+    check_months_ahead(last)
+
+    paths = forecast_paths({name: df[name] for name in FORECAST_FEATURES}, periods=last, fallbacks=fallbacks)
+    paths = {name: [round(float(v), 4) for v in path] for name, path in paths.items()}
+    history_features = _history_features(df, version)
+
+    inputs = []
+    for step in range(first, last + 1):
+        month = (start_month - 1 + step - first) % 12 + 1
+        year = start_year + (start_month - 1 + step - first) // 12
+        forecasts = {name: paths[name][step - 1] for name in FORECAST_FEATURES}
+        inputs.append((year, _input_row(month, forecasts, history_features)))
+    return inputs
@@ -0,0 +1,120 @@
+# ml_predict/ml/features.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+# column order the tuned XGBoost model was trained with
+MODEL_FEATURES = [
+    "Month", "Inflation Rate", "Generation Charge", "Avg_Temperature",
+    "Total_Bill_Lag1", "Generation_Charge_Lag1", "Inflation_Lag1", "Avg_Temp_Lag1",
+    "Total_Bill_Rolling3", "Gen_Charge_Rolling3", "Inflation_Rolling3", "Temp_Rolling3",
+    "Is_Hot_Season", "Is_Cold_Season",
+]
+
+TARGET = "Total Bill"
+
+# feature name -> source column. Lags and rolling means only look at previous
+# months, so the features of month t never include month t's own values.
+LAG1_FEATURES = {
+    "Total_Bill_Lag1": "Total Bill",
+    "Generation_Charge_Lag1": "Generation Charge",
+    "Inflation_Lag1": "Inflation Rate",
+    "Avg_Temp_Lag1": "Avg_Temperature",
+}
+ROLLING3_FEATURES = {
+    "Total_Bill_Rolling3": "Total Bill",
+    "Gen_Charge_Rolling3": "Generation Charge",
+    "Inflation_Rolling3": "Inflation Rate",
+    "Temp_Rolling3": "Avg_Temperature",
+}
+HISTORY_FEATURES = list(LAG1_FEATURES) + list(ROLLING3_FEATURES)
+
+HOT_SEASON_MONTHS = [4, 5]
+COLD_SEASON_MONTHS = [12, 1, 2]
+
+
+def season_flags(months):
+    """Is_Hot_Season / Is_Cold_Season for a scalar month or an array of months."""
+    months = np.asarray(months)
+    return {
+        "Is_Hot_Season": np.isin(months, HOT_SEASON_MONTHS).astype(np.int64),
+        "Is_Cold_Season": np.isin(months, COLD_SEASON_MONTHS).astype(np.int64),
+    }
+
+
+def compute_feature_table(df):
+    """Every lag, rolling and seasonal feature for the whole history in one vectorized pass.
+
+    The result has one row per history month plus a final row for the month
+    after the history: that row holds the lag/rolling features used when
+    serving the next prediction (its forecasted columns are NaN).
+    """
+    sources = sorted(set(LAG1_FEATURES.values()) | set(ROLLING3_FEATURES.values()))
+    values = df[sources].to_numpy(dtype=np.float64)
+    # one empty row for the month being predicted
+    values = np.vstack([values, np.full((1, len(sources)), np.nan)])
+    column = {name: i for i, name in enumerate(sources)}
+
+    shifted = np.full_like(values, np.nan)
+    shifted[1:] = values[:-1]
+    # mean of the 3 previous months, summed from the shifted arrays like tail(3).mean() does
+    # (a running cumulative sum drifts in the last digits on long histories); missing months are skipped
+    window = np.stack([values[:-3], values[1:-2], values[2:-1]])
+    count = (~np.isnan(window)).sum(axis=0)
+    rolling = np.full_like(values, np.nan)
+    with np.errstate(invalid="ignore"):
+        rolling[3:] = np.where(count > 0, np.nansum(window, axis=0) / count, np.nan)
+
+    months = df["Month"].to_numpy(dtype=np.int64)
+    last_month = months[-1] if len(months) else 0
+    months = np.append(months, last_month % 12 + 1)
+
+    table = {"Month": months}
+    for source in sources:
+        table[source] = values[:, column[source]]
+    for name, source in LAG1_FEATURES.items():
+        table[name] = shifted[:, column[source]]
+    for name, source in ROLLING3_FEATURES.items():
+        table[name] = rolling[:, column[source]]
+    table.update(season_flags(months))
+    return pd.DataFrame(table)
+
+
+def training_matrix(df):
+    """(X, y) for fitting the model: rows with a full 3-month lookback, MODEL_FEATURES order."""
+    table = compute_feature_table(df).iloc[:-1]
+    table = table.dropna(subset=HISTORY_FEATURES + [TARGET])
+    return table[MODEL_FEATURES].to_numpy(dtype=np.float32), table[TARGET].to_numpy(dtype=np.float32)
+
+
+def feature_matrix(inputs):
+    """Stack input dicts into a float32 matrix in MODEL_FEATURES order."""
+    return np.array([[input_data[name] for name in MODEL_FEATURES] for input_data in inputs], dtype=np.float32)
+
+
+class FeatureTableCache:
+    """Feature table of the current dataset, recomputed only when the dataset changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cached = None  # (frame, version, table)
+
+    def get(self, df, version):
+        """Table for ``df``, which must be the frame of dataset version ``version`` (see HistoricalDataset.snapshot)."""
+        cached = self._cached
+        if cached is not None and cached[0] is df and cached[1] == version:
+            return cached[2]
+        with self._lock:
+            cached = self._cached
+            if cached is None or cached[0] is not df or cached[1] != version:
+                cached = self._cached = (df, version, compute_feature_table(df))
+            return cached[2]
+
+    def invalidate(self):
+        with self._lock:
+            self._cached = None
+
+
+feature_table_cache = FeatureTableCache()
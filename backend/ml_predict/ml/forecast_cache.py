@@ -0,0 +1,66 @@
+# ml_predict/ml/forecast_cache.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+
+def series_fingerprint(series):
+    """Hash of the values of a series, independent of its name and index labels."""
+    values = np.ascontiguousarray(np.asarray(series, dtype="float64"))
+    return hashlib.sha1(values.tobytes()).hexdigest()
+
+
+class ForecastCache:
+    """LRU cache of fitted forecast models and their forecast paths.
+
+    Entries are keyed on (series fingerprint, model order, seasonal order), so a
+    changed history simply misses. ``invalidate()`` drops everything, which
+    the dataset layer calls whenever the CSV changes.
+    """
+
+    def __init__(self, max_entries=None):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_entries(self):
+        return self._max_entries or getattr(settings, "ML_FORECAST_CACHE_SIZE", 32)
+
+    @staticmethod
+    def key(series, order, seasonal_order):
+        return (series_fingerprint(series), tuple(order), tuple(seasonal_order))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, results, path):
+        with self._lock:
+            self._entries[key] = {"results": results, "path": path}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+forecast_cache = ForecastCache()
@@ -0,0 +1,172 @@
+# ml_predict/ml/forecast_engines.py
+
+import abc
+import concurrent.futures
+import logging
+
+import numpy as np
+from django.conf import settings
+
+from caching import SharedCache
+from instrumentation import span
+
+from .forecast_cache import forecast_cache
+from .forecast_pool import forecast_pool
+
+logger = logging.getLogger(__name__)
+
+SARIMAX_ORDER = (1, 0, 0)
+SARIMAX_SEASONAL_ORDER = (0, 1, 0, 12)
+SEASON = SARIMAX_SEASONAL_ORDER[3]
+
+# forecast paths keyed on the series contents, so every worker on the host reuses a fit
+shared_forecasts = SharedCache("forecast")
+
+
+def seasonal_naive_path(series, periods):
+    """Fallback forecast: the value of the same month one year earlier (the last value for short series)."""
+    values = np.asarray(series, dtype="float64")
+    if len(values) >= SEASON:
+        return np.array([values[len(values) - SEASON + step % SEASON] for step in range(periods)])
+    return np.full(periods, values[-1] if len(values) else 0.0)
+
+
+class ForecastEngine(abc.ABC):
+    """Forecasts several independent monthly series at once.
+
+    ``forecast_paths({name: series}, periods)`` returns {name: numpy array}
+    with ``periods`` steps per series. Engines return NaN for steps they
+    couldn't forecast; feature_forecast fills those from the seasonal naive
+    forecast and reports them, so the result isn't cached.
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def forecast_paths(self, series_by_name, periods):
+        """{name: numpy array of ``periods`` steps} for every series in ``series_by_name``."""
+
+
+def _remember_fit(key, results, path):
+    forecast_cache.put(key, results, path)
+    shared_forecasts.set(key, path)
+
+
+class SarimaxEngine(ForecastEngine):
+    """statsmodels SARIMAX(1,0,0)x(0,1,0,12) per series, fitted concurrently on the forecast pool.
+
+    Fitted models and paths out to ML_FORECAST_MAX_HORIZON are memoized per
+    series, in this process and in the shared cache, so later calls for any
+    horizon just slice the cached path. A fit
+    that fails or is still running after ML_FORECAST_TIMEOUT seconds gives
+    a NaN path, i.e. the seasonal naive fallback.
+    """
+
+    name = "sarimax"
+
+    def forecast_paths(self, series_by_name, periods):
+        horizon = max(periods, getattr(settings, "ML_FORECAST_MAX_HORIZON", 24))
+        paths, pending = {}, {}
+        for name, series in series_by_name.items():
+            key = forecast_cache.key(series, SARIMAX_ORDER, SARIMAX_SEASONAL_ORDER)
+            entry = forecast_cache.get(key)
+            if entry is not None and len(entry["path"]) >= periods:
+                paths[name] = entry["path"][:periods]
+            elif entry is not None and entry["results"] is not None:
+                # longer than anything asked for so far, extend the cached path
+                path = np.asarray(entry["results"].forecast(steps=periods), dtype="float64")
+                forecast_cache.put(key, entry["results"], path)
+                paths[name] = path
+            else:
+                shared = shared_forecasts.get(key)
+                if shared is not None and len(shared) >= periods:
+                    # fitted by another worker; only the path is shared, not the results object
+                    forecast_cache.put(key, None, shared)
+                    paths[name] = shared[:periods]
+                    continue
+                # not fitted yet, or fitted in a worker process that kept only the path
+                pending[name] = forecast_pool.submit(
+                    key, series, SARIMAX_ORDER, SARIMAX_SEASONAL_ORDER, horizon, on_done=_remember_fit, label=name,
+                )
+
+        if pending:
+            # the fits were started together, so one deadline covers each of them
+            timeout = getattr(settings, "ML_FORECAST_TIMEOUT", 20)
+            with span("forecast_wait", fits=len(pending)):
+                concurrent.futures.wait(pending.values(), timeout=timeout)
+            for name, future in pending.items():
+                if future.done() and future.exception() is None:
+                    path = future.result()[1]
+                    if len(path) < periods:
+                        # shorter than asked for; the missing steps are filled from the seasonal naive forecast
+                        path = np.concatenate([path, np.full(periods - len(path), np.nan)])
+                    paths[name] = path[:periods]
+                    continue
+                reason = future.exception() if future.done() else f"no result after {timeout}s"
+                logger.warning("SARIMAX fit for %s failed (%s), using seasonal naive forecast", name, reason)
+                paths[name] = np.full(periods, np.nan)
+        return paths
+
+
+def seasonal_ar1_paths(values, periods, season=SEASON):
+    """Closed-form forecasts of AR(1) on seasonal differences for a batch of series.
+
+    ``values`` is an (n_series, n_months) array. With z_t = y_t - y_{t-season},
+    phi is the least-squares estimate of z_t = phi * z_{t-1} for every row at
+    once; forecasts are z_{T+h} = phi^h * z_T added back onto the value one
+    season earlier. This is the model SARIMAX(1,0,0)x(0,1,0,season) fits,
+    without the numerical likelihood optimization. Returns
+    (paths of shape (n_series, periods), phi).
+    """
+    values = np.asarray(values, dtype="float64")
+    n_series, n_months = values.shape
+    z = values[:, season:] - values[:, :-season]
+    lagged, current = z[:, :-1], z[:, 1:]
+    denominator = np.einsum("ij,ij->i", lagged, lagged)
+    numerator = np.einsum("ij,ij->i", lagged, current)
+    phi = np.divide(numerator, denominator, out=np.zeros(n_series), where=denominator > 0)
+
+    extended = np.concatenate([values, np.empty((n_series, periods))], axis=1)
+    # phi^1..phi^periods times the last seasonal difference, for every series
+    z_path = z[:, -1:] * phi[:, None] ** np.arange(1, periods + 1)
+    for step in range(periods):
+        # later steps build on forecasts from the first season
+        extended[:, n_months + step] = extended[:, n_months + step - season] + z_path[:, step]
+    return extended[:, n_months:], phi
+
+
+class SeasonalAR1Engine(ForecastEngine):
+    """Least-squares AR(1) on seasonal differences in NumPy, all series of a call in one batch."""
+
+    name = "ar1_lstsq"
+
+    def forecast_paths(self, series_by_name, periods):
+        paths = {}
+        # series of the same length are stacked and solved together
+        by_length = {}
+        for name, series in series_by_name.items():
+            values = np.asarray(series, dtype="float64")
+            if len(values) < SEASON + 2 or np.isnan(values).any():
+                # too short (or gappy) to estimate phi, same fallback as a failed SARIMAX fit
+                paths[name] = np.full(periods, np.nan)
+            else:
+                by_length.setdefault(len(values), []).append((name, values))
+
+        with span("forecast_lstsq", series=len(series_by_name)):
+            for group in by_length.values():
+                group_paths, _ = seasonal_ar1_paths(np.stack([values for _, values in group]), periods)
+                for (name, _), path in zip(group, group_paths):
+                    paths[name] = path
+        return paths
+
+
+ENGINES = {engine.name: engine for engine in (SarimaxEngine(), SeasonalAR1Engine())}
+
+
+def get_engine(name=None):
+    """The engine called ``name``, by default the one ML_FORECAST_ENGINE selects."""
+    name = name or getattr(settings, "ML_FORECAST_ENGINE", "sarimax")
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown forecasting engine {name!r}, expected one of: {', '.join(ENGINES)}")
@@ -0,0 +1,133 @@
+# ml_predict/ml/forecast_pool.py
+
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from instrumentation import record
+
+
+def fit_forecast(values, order, seasonal_order, horizon, keep_results=True):
+    """Fit one SARIMAX model and forecast ``horizon`` steps.
+
+    Module-level so it can run in a worker process; there the fitted results
+    are dropped (``keep_results=False``) instead of being pickled back.
+    """
+    # statsmodels takes about a second to import, keep it off the startup path
+    import statsmodels.api as sm
+
+    model = sm.tsa.SARIMAX(values, order=order, seasonal_order=seasonal_order, enforce_stationarity=False, enforce_invertibility=False)
+    results = model.fit(disp=False)
+    path = np.asarray(results.forecast(steps=horizon), dtype="float64")
+    return (results if keep_results else None), path
+
+
+class ForecastPool:
+    """Runs independent SARIMAX fits concurrently.
+
+    ML_FORECAST_EXECUTOR picks "thread" (the default), "process" or
+    "serial". A fit for the same key that is already running is shared when
+    it forecasts at least as far ahead, and a fit keeps running after its
+    caller timed out, so its result still lands in the cache for the next
+    request.
+    """
+
+    def __init__(self, kind=None, workers=None):
+        self._kind = kind
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._in_flight = {}
+
+    @property
+    def kind(self):
+        return self._kind or getattr(settings, "ML_FORECAST_EXECUTOR", "thread")
+
+    @property
+    def workers(self):
+        return self._workers or getattr(settings, "ML_FORECAST_WORKERS", 3)
+
+    def _get_executor(self):
+        # pools don't survive a fork (e.g. gunicorn workers), build one per process
+        if self._executor is None or self._pid != os.getpid():
+            if self.kind == "process":
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sarimax")
+            self._pid = os.getpid()
+            self._in_flight = {}
+        return self._executor
+
+    def submit(self, key, values, order, seasonal_order, horizon, on_done=None, label=None):
+        """Start (or join) the fit for ``key``; returns a Future of (results, path).
+
+        A running fit for ``key`` is only joined if its horizon covers
+        ``horizon``; otherwise a longer fit is started and replaces it for
+        later callers.
+
+        ``on_done(key, results, path)`` runs once when a fit succeeds. The fit
+        is timed as the "sarimax_fit" stage (queueing included), labelled
+        with ``label``.
+        """
+        start = time.perf_counter()
+        if self.kind == "serial":
+            future = concurrent.futures.Future()
+            try:
+                results, path = fit_forecast(values, order, seasonal_order, horizon)
+            except Exception as e:
+                record("sarimax_fit", time.perf_counter() - start, labels={"feature": label}, status="error")
+                future.set_exception(e)
+                return future
+            record("sarimax_fit", time.perf_counter() - start, labels={"feature": label}, status="ok")
+            if on_done is not None:
+                on_done(key, results, path)
+            future.set_result((results, path))
+            return future
+
+        with self._lock:
+            executor = self._get_executor()
+            running = self._in_flight.get(key)
+            if running is not None and running[1] >= horizon:
+                return running[0]
+            try:
+                future = executor.submit(
+                    fit_forecast, np.asarray(values, dtype="float64"), order, seasonal_order, horizon, self.kind != "process",
+                )
+            except RuntimeError as e:
+                # includes BrokenProcessPool: drop the pool so the next call builds a fresh one
+                self._executor = None
+                future = concurrent.futures.Future()
+                future.set_exception(e)
+                return future
+            self._in_flight[key] = (future, horizon)
+
+        def finished(f):
+            with self._lock:
+                running = self._in_flight.get(key)
+                if running is not None and running[0] is f:
+                    del self._in_flight[key]
+            failed = f.cancelled() or f.exception() is not None
+            record("sarimax_fit", time.perf_counter() - start, labels={"feature": label}, status="error" if failed else "ok")
+            if on_done is not None and not f.cancelled() and f.exception() is None:
+                on_done(key, *f.result())
+
+        future.add_done_callback(finished)
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._in_flight = {}
+
+
+forecast_pool = ForecastPool()
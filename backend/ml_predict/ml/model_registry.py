@@ -0,0 +1,141 @@
+# ml_predict/ml/model_registry.py
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from instrumentation import span
+
+from .features import MODEL_FEATURES
+from .training import NATIVE_FORMATS, load_metadata
+from .tree_inference import FlatTreeEnsemble
+
+logger = logging.getLogger(__name__)
+
+
+def default_model_path():
+    return getattr(
+        settings,
+        "ML_MODEL_PATH",
+        os.path.join(settings.BASE_DIR, "models", "xgb_total_bill_model_tuned_may.pkl"),
+    )
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_model_file(path):
+    """Load a model saved by export_model (.json/.ubj) or a legacy joblib pickle."""
+    if str(path).endswith(NATIVE_FORMATS):
+        import xgboost as xgb
+
+        model = xgb.XGBRegressor()
+        model.load_model(path)
+        return model
+    # joblib pulls in xgboost/sklearn on unpickling, only import it when loading
+    import joblib
+
+    return joblib.load(path)
+
+
+def check_features(model, metadata):
+    # a model trained on a different column order would silently give wrong predictions
+    features = (metadata or {}).get("features") or getattr(model.get_booster(), "feature_names", None)
+    if features and list(features) != MODEL_FEATURES:
+        raise ValueError(f"Model features {features} do not match MODEL_FEATURES {MODEL_FEATURES}.")
+
+
+class ModelRegistry:
+    """Keeps one deserialized model in memory and reloads it only when the file changes.
+
+    The model object is shared by every request thread; XGBoost's predict is
+    safe to call concurrently, so the lock only guards (re)loading.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._model = None
+        self._ensemble = None  # (model, FlatTreeEnsemble) built from it
+        self.metadata = None
+        self._stat = None  # (mtime_ns, size) of the file we last checked
+        self.version = None
+        self.load_seconds = None
+        self.loaded_at = None
+
+    @property
+    def path(self):
+        return self._path or default_model_path()
+
+    def _current_stat(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self):
+        """Return the loaded model, reloading it first if the file changed on disk."""
+        stat = self._current_stat()
+        if self._model is not None and stat == self._stat:
+            return self._model
+
+        with self._lock:
+            # another thread may have reloaded while we waited for the lock
+            stat = self._current_stat()
+            if self._model is not None and stat == self._stat:
+                return self._model
+
+            file_hash = _file_sha256(self.path)
+            if self._model is not None and file_hash[:12] == self.version:
+                # touched but not changed, keep the model we have
+                self._stat = stat
+                return self._model
+
+            start = time.perf_counter()
+            with span("model_load"):
+                model = load_model_file(self.path)
+                metadata = load_metadata(self.path)
+                check_features(model, metadata)
+            self.load_seconds = time.perf_counter() - start
+            self.loaded_at = time.time()
+            self.version = file_hash[:12]
+            self._stat = stat
+            self.metadata = metadata
+            self._model = model
+            logger.info("loaded %s version=%s in %.1f ms", os.path.basename(self.path), self.version, self.load_seconds * 1000)
+            return self._model
+
+    def ensemble(self):
+        """The current model as a FlatTreeEnsemble, flattened once per (re)load."""
+        model = self.get()
+        built = self._ensemble
+        if built is not None and built[0] is model:
+            return built[1]
+        with self._lock:
+            if self._ensemble is None or self._ensemble[0] is not model:
+                with span("model_flatten"):
+                    self._ensemble = (model, FlatTreeEnsemble.from_booster(model))
+            return self._ensemble[1]
+
+    def info(self):
+        return {
+            "path": str(self.path),
+            "version": self.version,
+            "load_seconds": round(self.load_seconds, 4) if self.load_seconds is not None else None,
+            "loaded_at": self.loaded_at,
+            "trained_at": (self.metadata or {}).get("trained_at"),
+        }
+
+
+registry = ModelRegistry()
+
+
+def get_model():
+    return registry.get()
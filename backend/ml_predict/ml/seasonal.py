@@ -0,0 +1,115 @@
+# ml_predict/ml/seasonal.py
+
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEASONAL_FACTOR = 1.01
+
+# used when pastRates.json can't be loaded
+STATIC_SEASONAL_FACTORS = np.full(12, DEFAULT_SEASONAL_FACTOR)
+STATIC_SEASONAL_FACTORS[4 - 1] = 1.03  # 3% adjustment for April
+STATIC_SEASONAL_FACTORS[5 - 1] = 1.04  # 4% increase for May
+
+
+def default_rates_path():
+    return getattr(
+        settings,
+        "ML_PAST_RATES_PATH",
+        os.path.join(settings.BASE_DIR.parent, "frontend", "seconsumptiontracker-app", "src", "assets", "datas", "pastRates.json"),
+    )
+
+
+class SeasonalTable:
+    """Per-month statistics of pastRates.json as 12-entry arrays (index 0 = January)."""
+
+    def __init__(self, records=None):
+        self.monthly_average = np.full(12, np.nan)
+        self.latest_value = np.full(12, np.nan)
+        self.latest_year = np.zeros(12, dtype=np.int64)
+        self.has_data = np.zeros(12, dtype=bool)
+
+        if records is None:
+            self.factors = STATIC_SEASONAL_FACTORS.copy()
+            return
+
+        months = np.array([r["Month"] for r in records], dtype=np.int64)
+        years = np.array([r["Year"] for r in records], dtype=np.int64)
+        bills = np.array([r["Total Bill"] for r in records], dtype=np.float64)
+
+        counts = np.bincount(months - 1, minlength=12)[:12]
+        sums = np.bincount(months - 1, weights=bills, minlength=12)[:12]
+        self.has_data = counts > 0
+        self.monthly_average[self.has_data] = sums[self.has_data] / counts[self.has_data]
+
+        # most recent year's value per month: the first record after sorting by (month, -year)
+        order = np.lexsort((-years, months))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = months[order][1:] != months[order][:-1]
+        latest = order[first]
+        self.latest_value[months[latest] - 1] = bills[latest]
+        self.latest_year[months[latest] - 1] = years[latest]
+
+        # How much each month typically varies from the overall average,
+        # amplified slightly to account for recent trends and clamped to reasonable bounds
+        seasonal_variation = self.monthly_average / bills.mean()
+        factors = np.clip(1.0 + (seasonal_variation - 1.0) * 1.5, 0.95, 1.1)
+        self.factors = np.where(self.has_data, factors, DEFAULT_SEASONAL_FACTOR)
+
+    def factors_for(self, months):
+        return self.factors[np.asarray(months, dtype=np.int64) - 1]
+
+    def reference(self, month):
+        """(latest known value, its year) for a month, or (None, None)."""
+        i = int(month) - 1
+        if not 0 <= i < 12 or not self.has_data[i]:
+            return None, None
+        return float(self.latest_value[i]), int(self.latest_year[i])
+
+
+class SeasonalIndex:
+    """Builds the SeasonalTable once and rebuilds it only when the rates file changes."""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._table = None
+        self._stat = None
+
+    @property
+    def path(self):
+        return self._path or default_rates_path()
+
+    def _current_stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def table(self):
+        stat = self._current_stat()
+        if self._table is not None and stat == self._stat:
+            return self._table
+
+        with self._lock:
+            stat = self._current_stat()
+            if self._table is None or stat != self._stat:
+                try:
+                    with open(self.path, "r") as f:
+                        self._table = SeasonalTable(json.load(f))
+                except Exception as e:
+                    logger.warning("Error loading historical rates: %s", e)
+                    # Fallback to original static seasonal factors if file can't be loaded
+                    self._table = SeasonalTable()
+                self._stat = stat
+            return self._table
+
+
+seasonal_index = SeasonalIndex()
@@ -0,0 +1,132 @@
+# ml_predict/ml/training.py
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from .features import MODEL_FEATURES, TARGET, training_matrix
+
+# hyperparameters of the tuned model we shipped as a pickle (the XGBRegressor wrapper's
+# params; the booster config saved inside that pickle only lists xgboost's defaults)
+DEFAULT_PARAMS = {
+    "n_estimators": 500,
+    "learning_rate": 0.01,
+    "max_depth": 4,
+    "subsample": 0.8,
+    "colsample_bytree": 1.0,
+    "min_child_weight": 1,
+    "objective": "reg:squarederror",
+    "tree_method": "hist",
+    "random_state": 42,
+}
+
+NATIVE_FORMATS = (".json", ".ubj")
+
+
+def metadata_path(model_path):
+    """Sidecar file next to the model: models/foo.ubj -> models/foo.meta.json"""
+    root, _ = os.path.splitext(str(model_path))
+    return root + ".meta.json"
+
+
+def _fit(X, y, params, nthread):
+    import xgboost as xgb
+
+    model = xgb.XGBRegressor(**params, n_jobs=nthread)
+    model.fit(X, y)
+    # keep the column names in the saved model so the registry can check them
+    model.get_booster().feature_names = list(MODEL_FEATURES)
+    return model
+
+
+def _metrics(y_true, y_pred):
+    errors = np.asarray(y_pred, dtype="float64") - np.asarray(y_true, dtype="float64")
+    return {
+        "mae": round(float(np.abs(errors).mean()), 4),
+        "rmse": round(float(np.sqrt((errors ** 2).mean())), 4),
+    }
+
+
+def train_model(df, params=None, nthread=None, holdout=12):
+    """Fit the Total Bill model on the shared feature pipeline.
+
+    The last ``holdout`` months are scored by a model trained on the months
+    before them; the returned model is then refit on the full history.
+    Returns (model, report).
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    # 0 lets xgboost use every core
+    nthread = nthread or 0
+    X, y = training_matrix(df)
+    if len(y) <= holdout:
+        raise ValueError(f"Need more than {holdout} training rows, got {len(y)}.")
+
+    report = {"rows": int(len(y)), "holdout": holdout, "nthread": nthread, "params": params}
+    if holdout:
+        start = time.perf_counter()
+        model = _fit(X[:-holdout], y[:-holdout], params, nthread)
+        report["holdout_metrics"] = _metrics(y[-holdout:], model.predict(X[-holdout:]))
+        report["holdout_fit_seconds"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    model = _fit(X, y, params, nthread)
+    report["fit_seconds"] = round(time.perf_counter() - start, 3)
+    report["train_metrics"] = _metrics(y, model.predict(X))
+    return model, report
+
+
+def _atomic_write(path, write):
+    # write next to the target and rename, so a serving process never sees a half-written file
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def export_model(model, path, calibration, report=None):
+    """Save ``model`` in XGBoost's native format plus its metadata file.
+
+    ``calibration`` holds expected_colab_prediction / actual_app_prediction /
+    calibration_factor. The metadata is written first so the registry, which
+    watches the model file, always finds metadata matching the new model.
+    """
+    path = str(path)
+    if not path.endswith(NATIVE_FORMATS):
+        raise ValueError(f"Model path must end with one of {', '.join(NATIVE_FORMATS)}: {path}")
+
+    booster = model.get_booster()
+    metadata = {
+        "format": os.path.splitext(path)[1].lstrip("."),
+        "features": list(booster.feature_names or MODEL_FEATURES),
+        "target": TARGET,
+        "calibration": calibration,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "xgboost_version": __import__("xgboost").__version__,
+        "training": report or {},
+    }
+
+    def write_metadata(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+
+    _atomic_write(metadata_path(path), write_metadata)
+    _atomic_write(path, model.save_model)
+    return metadata
+
+
+def load_metadata(model_path):
+    """Metadata written by export_model, or None for models without one (e.g. the legacy pickle)."""
+    try:
+        with open(metadata_path(model_path), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
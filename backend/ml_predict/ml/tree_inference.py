@@ -0,0 +1,122 @@
+# ml_predict/ml/tree_inference.py
+
+import json
+
+import numpy as np
+
+# objectives whose prediction is the raw margin, nothing to transform
+IDENTITY_OBJECTIVES = ("reg:squarederror", "reg:linear", "reg:absoluteerror", "reg:pseudohubererror")
+ROOT_PARENT = 2147483647
+
+
+def _base_score(learner_model_param):
+    # "5.5E-1" in older models, "[5.5E-1]" since XGBoost 3
+    return float(learner_model_param["base_score"].strip("[]"))
+
+
+class FlatTreeEnsemble:
+    """XGBoost regression trees flattened into NumPy arrays.
+
+    Every tree's nodes are concatenated into one set of arrays. Leaves point
+    to themselves as both children, so walking ``max_depth`` steps from the
+    roots ends on a leaf in every tree and the walk needs no per-tree loop.
+    Predicting one row is a handful of array operations, without the
+    DataFrame validation, DMatrix construction and thread pool an
+    ``XGBRegressor.predict`` call goes through.
+    """
+
+    def __init__(self, left, right, feature, threshold, default_left, value, roots, base_score, max_depth, num_features):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_score = base_score
+        self.max_depth = max_depth
+        self.num_features = num_features
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Flatten an ``xgboost.Booster`` (or anything with ``get_booster()``)."""
+        if hasattr(booster, "get_booster"):
+            booster = booster.get_booster()
+        learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f"Objective {objective!r} is not supported, expected one of {IDENTITY_OBJECTIVES}.")
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError(f"Booster {learner['gradient_booster']['name']!r} is not supported, expected gbtree.")
+        if int(learner["learner_model_param"].get("num_target", 1)) != 1:
+            raise ValueError("Multi-target models are not supported.")
+
+        model = learner["gradient_booster"]["model"]
+        trees = model["trees"]
+        # like XGBRegressor.predict, stop at the best iteration of an early-stopped model
+        best_iteration = booster.attr("best_iteration")
+        if best_iteration is not None:
+            trees = trees[:model["iteration_indptr"][int(best_iteration) + 1]]
+
+        left, right, feature, threshold, default_left, value, roots, depths = [], [], [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported.")
+            tree_left = np.asarray(tree["left_children"], dtype=np.int64)
+            tree_right = np.asarray(tree["right_children"], dtype=np.int64)
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            ids = np.arange(len(tree_left))
+            leaf = tree_left == -1
+
+            left.append(np.where(leaf, ids, tree_left) + offset)
+            right.append(np.where(leaf, ids, tree_right) + offset)
+            feature.append(np.where(leaf, 0, tree["split_indices"]))
+            threshold.append(conditions)
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            # a leaf's split_condition holds its value
+            value.append(np.where(leaf, conditions, np.float32(0)))
+            roots.append(offset)
+
+            # nodes are numbered in expansion order, so a parent always comes before its children
+            depth = np.zeros(len(ids), dtype=np.int64)
+            for node, parent in enumerate(tree["parents"]):
+                if parent != ROOT_PARENT:
+                    depth[node] = depth[parent] + 1
+            depths.append(int(depth.max()))
+            offset += len(ids)
+
+        return cls(
+            left=np.concatenate(left),
+            right=np.concatenate(right),
+            feature=np.concatenate(feature).astype(np.int64),
+            threshold=np.concatenate(threshold),
+            default_left=np.concatenate(default_left),
+            value=np.concatenate(value),
+            roots=np.asarray(roots, dtype=np.int64),
+            base_score=np.float32(_base_score(learner["learner_model_param"])),
+            max_depth=max(depths, default=0),
+            num_features=int(learner["learner_model_param"]["num_feature"]),
+        )
+
+    @property
+    def num_trees(self):
+        return len(self.roots)
+
+    def predict(self, X):
+        """Predictions for a float32 feature matrix (or a single feature vector) in training column order."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.num_features:
+            raise ValueError(f"Expected {self.num_features} features, got {X.shape[1]}.")
+
+        nodes = np.broadcast_to(self.roots, (len(X), self.num_trees))
+        for _ in range(self.max_depth):
+            x = np.take_along_axis(X, self.feature[nodes], axis=1)
+            # XGBoost goes left when value < condition, and sends missing values the default way
+            go_left = np.where(np.isnan(x), self.default_left[nodes], x < self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        # add the leaves in tree order onto base_score in float32, as XGBoost does, for bit-identical output
+        margins = np.concatenate([np.full((len(X), 1), self.base_score, dtype=np.float32), self.value[nodes]], axis=1)
+        return np.cumsum(margins, axis=1, dtype=np.float32)[:, -1]
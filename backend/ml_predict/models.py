@@ -1,3 +1,17 @@
 from django.db import models
 
 # Create your models here.
+class PredictionSnapshot(models.Model):
+    # a precomputed /api/predict/ payload, see ml_predict.snapshots
+    year = models.IntegerField()
+    month = models.IntegerField()
+    payload = models.JSONField()
+    # model/dataset/rates fingerprint the payload was computed from
+    source_version = models.CharField(max_length=64, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['year', 'month'], name='unique_snapshot_month')]
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} ({self.source_version})"
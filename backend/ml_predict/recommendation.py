@@ -0,0 +1,278 @@
+# ml_predict/recommendation.py
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from caching import SharedCache, SingleFlight, TTLCache
+
+
+class GatewayBusy(Exception):
+    """The wait queue is full; the caller should retry later."""
+
+
+class GatewayTimeout(Exception):
+    """No free slot became available within the configured timeout."""
+
+
+class _AsyncWaiter:
+    """An async caller queued for a slot; ``granted`` is set under the gateway lock on hand-off."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+def _grant(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _default_client_factory(src):
+    # imported lazily, gradio_client is slow to import
+    from gradio_client import Client
+    return Client(src, verbose=False)
+
+
+class RecommendationGateway:
+    """Pool of warm gradio clients for the Hugging Face recommendation Space.
+
+    At most ``concurrency`` calls run at once, each on its own pooled client.
+    Up to ``queue_size`` further callers wait for a free slot (for at most
+    ``timeout`` seconds) instead of being rejected straight away; beyond that
+    GatewayBusy is raised. Async callers wait on an event-loop future, so a
+    queued request holds no thread, and a freed slot is handed straight to
+    the oldest of them.
+    """
+
+    def __init__(self, src=None, api_name=None, concurrency=None, queue_size=None, timeout=None, client_factory=None):
+        self._src = src
+        self._api_name = api_name
+        self._concurrency = concurrency
+        self._queue_size = queue_size
+        self._timeout = timeout
+        self._client_factory = client_factory or _default_client_factory
+
+        self._cond = threading.Condition()
+        self._idle_clients = []
+        self._active = 0
+        self._waiting = 0
+        self._async_waiters = deque()
+
+    @property
+    def src(self):
+        return self._src or getattr(settings, "HF_RECOMMENDATION_SPACE", "Wh1plashR/AppTry")
+
+    @property
+    def api_name(self):
+        return self._api_name or getattr(settings, "HF_RECOMMENDATION_API_NAME", "/predict")
+
+    @property
+    def concurrency(self):
+        return self._concurrency or getattr(settings, "HF_RECOMMENDATION_CONCURRENCY", 2)
+
+    @property
+    def queue_size(self):
+        if self._queue_size is not None:
+            return self._queue_size
+        return getattr(settings, "HF_RECOMMENDATION_QUEUE_SIZE", 16)
+
+    @property
+    def timeout(self):
+        return self._timeout or getattr(settings, "HF_RECOMMENDATION_TIMEOUT", 120)
+
+    def _try_acquire(self):
+        # caller holds self._cond
+        if self._active < self.concurrency:
+            self._active += 1
+            return True
+        return False
+
+    def _acquire(self):
+        with self._cond:
+            if self._try_acquire():
+                return
+            if self._waiting >= self.queue_size:
+                raise GatewayBusy("Recommendation service is busy. Please wait and try again.")
+            self._waiting += 1
+            try:
+                deadline = time.monotonic() + self.timeout
+                while not self._try_acquire():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise GatewayTimeout("Timed out waiting for the recommendation service.")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    async def _aacquire(self):
+        with self._cond:
+            if self._try_acquire():
+                return
+            if self._waiting >= self.queue_size:
+                raise GatewayBusy("Recommendation service is busy. Please wait and try again.")
+            self._waiting += 1
+            waiter = _AsyncWaiter(asyncio.get_running_loop())
+            self._async_waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter.future, self.timeout)
+        except BaseException as e:  # timeout or cancellation (a client disconnect)
+            with self._cond:
+                if waiter.granted:
+                    # the slot arrived as we gave up, pass it on
+                    self._free_slot()
+                else:
+                    self._async_waiters.remove(waiter)
+            if isinstance(e, TimeoutError):
+                raise GatewayTimeout("Timed out waiting for the recommendation service.") from None
+            raise
+        finally:
+            with self._cond:
+                self._waiting -= 1
+
+    def _free_slot(self):
+        # caller holds self._cond
+        while self._async_waiters:
+            # the slot stays taken and moves to the oldest async waiter
+            waiter = self._async_waiters.popleft()
+            try:
+                waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+            except RuntimeError:
+                continue  # its event loop is closed
+            waiter.granted = True
+            return
+        self._active -= 1
+        self._cond.notify()
+
+    def _release(self, client, healthy):
+        with self._cond:
+            if client is not None and healthy:
+                self._idle_clients.append(client)
+            self._free_slot()
+
+    def _checkout_client(self):
+        with self._cond:
+            if self._idle_clients:
+                return self._idle_clients.pop()
+        # connecting fetches the Space config, do it outside the lock
+        return self._client_factory(self.src)
+
+    def warm(self):
+        """Open one client ahead of the first request."""
+        self._acquire()
+        client = None
+        try:
+            client = self._checkout_client()
+        finally:
+            self._release(client, client is not None)
+
+    def recommend(self, appliance_info):
+        self._acquire()
+        client, healthy = None, False
+        try:
+            client = self._checkout_client()
+            result = client.predict(appliance_info=appliance_info, api_name=self.api_name)
+            healthy = True
+            return result
+        finally:
+            # a client that raised may hold a broken connection, drop it
+            self._release(client, healthy)
+
+    async def arecommend(self, appliance_info):
+        """Async variant for ASGI views; neither waiting for a slot nor for the Space holds a thread."""
+        await self._aacquire()
+
+        client, healthy = None, False
+        try:
+            with self._cond:
+                if self._idle_clients:
+                    client = self._idle_clients.pop()
+            if client is None:
+                client = await asyncio.to_thread(self._client_factory, self.src)
+            job = client.submit(appliance_info=appliance_info, api_name=self.api_name)
+            result = await asyncio.wrap_future(job)
+            healthy = True
+            return result
+        finally:
+            self._release(client, healthy)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self._active,
+                "waiting": self._waiting,
+                "idle_clients": len(self._idle_clients),
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+            }
+
+
+gateway = RecommendationGateway()
+
+
+recommendation_cache = TTLCache(
+    max_entries=getattr(settings, "HF_RECOMMENDATION_CACHE_SIZE", 512),
+    ttl=getattr(settings, "HF_RECOMMENDATION_CACHE_TTL", 24 * 60 * 60),
+)
+# shared by every worker, so a recommendation is fetched from the Space once per host
+shared_recommendations = SharedCache(
+    "recommendation", timeout=getattr(settings, "HF_RECOMMENDATION_CACHE_TTL", 24 * 60 * 60),
+)
+_in_flight = SingleFlight()
+
+
+def normalize_appliance_info(text):
+    # "  Aircon 1.5HP,  8 hrs " and "aircon 1.5hp, 8 hrs" should share a cache entry
+    return " ".join(str(text).lower().split())
+
+
+def get_recommendation(appliance_info):
+    """Cached recommendation; identical concurrent requests share one remote call.
+
+    Looks in this process's LRU, then the shared cache, then asks the Space.
+    """
+    key = normalize_appliance_info(appliance_info)
+    result = recommendation_cache.get(key)
+    if result is not None:
+        return result
+
+    def fetch():
+        fresh = shared_recommendations.get(key)
+        if fresh is None:
+            fresh = gateway.recommend(appliance_info)
+            shared_recommendations.set(key, fresh)
+        recommendation_cache.set(key, fresh)
+        return fresh
+
+    return _in_flight.do(key, fetch)
+
+
+async def aget_recommendation(appliance_info):
+    key = normalize_appliance_info(appliance_info)
+    result = recommendation_cache.get(key)
+    if result is not None:
+        return result
+
+    async def fetch():
+        fresh = await shared_recommendations.aget(key)
+        if fresh is None:
+            fresh = await gateway.arecommend(appliance_info)
+            await shared_recommendations.aset(key, fresh)
+        recommendation_cache.set(key, fresh)
+        return fresh
+
+    return await _in_flight.ado(key, fetch)
+
+
+def cache_stats():
+    return {
+        **recommendation_cache.stats(),
+        "coalesced": _in_flight.coalesced,
+        "shared": shared_recommendations.stats(),
+        "gateway": gateway.stats(),
+    }
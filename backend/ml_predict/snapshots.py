@@ -0,0 +1,142 @@
+# ml_predict/snapshots.py
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils.http import http_date
+
+from .ml.dataset import dataset, load_history
+from .ml.feature_forecast import build_input_range, next_month_after
+from .ml.forecast_engines import get_engine
+from .ml.model_registry import registry
+from .ml.prediction import predict_inputs
+from .ml.seasonal import seasonal_index
+from .models import PredictionSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class FileFingerprint:
+    """Short sha256 of a file, recomputed only when its mtime or size changes."""
+
+    def __init__(self, get_path):
+        self._get_path = get_path
+        self._stat = None
+        self._digest = None
+
+    def get(self):
+        path = self._get_path()
+        try:
+            st = os.stat(path)
+        except OSError:
+            return "missing"
+        stat = (st.st_mtime_ns, st.st_size)
+        if stat != self._stat:
+            with open(path, "rb") as f:
+                self._digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            self._stat = stat
+        return self._digest
+
+
+_dataset_fingerprint = FileFingerprint(lambda: dataset.path)
+_rates_fingerprint = FileFingerprint(lambda: seasonal_index.path)
+
+
+def source_version():
+    """Identifies everything a prediction depends on: model, history CSV, pastRates.json and forecasting engine."""
+    registry.get()
+    return f"{registry.version}-{_dataset_fingerprint.get()}-{_rates_fingerprint.get()}-{get_engine().name}"
+
+
+def default_target():
+    """(month, year) predict_total_bill uses when none is given."""
+    return next_month_after(load_history().iloc[-1])
+
+
+class SnapshotStore:
+    """In-memory copy of the PredictionSnapshot rows for the current source version.
+
+    Rows are re-read from the database when the source version changes and
+    at most every ML_SNAPSHOT_REFRESH_SECONDS otherwise, so snapshots written
+    by the management command in another process are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = None
+        self._loaded_at = 0
+
+    def _reload(self, version):
+        entries = {}
+        for snapshot in PredictionSnapshot.objects.filter(source_version=version):
+            etag = f'"{version}-{snapshot.year}-{snapshot.month:02d}-{int(snapshot.created_at.timestamp())}"'
+            entries[(snapshot.year, snapshot.month)] = {
+                "payload": snapshot.payload,
+                "etag": etag,
+                "last_modified": http_date(snapshot.created_at.timestamp()),
+            }
+        self._entries = entries
+        self._version = version
+        self._loaded_at = time.monotonic()
+
+    def lookup(self, year, month):
+        if not getattr(settings, "ML_SNAPSHOT_ENABLED", True):
+            return None
+        version = source_version()
+        refresh = getattr(settings, "ML_SNAPSHOT_REFRESH_SECONDS", 60)
+        if version != self._version or time.monotonic() - self._loaded_at > refresh:
+            with self._lock:
+                if version != self._version or time.monotonic() - self._loaded_at > refresh:
+                    try:
+                        self._reload(version)
+                    except DatabaseError as e:
+                        # e.g. migrations not applied yet; predictions still work without snapshots
+                        logger.warning("could not load snapshots: %s", e)
+                        self._entries, self._version, self._loaded_at = {}, version, time.monotonic()
+        return self._entries.get((year, month))
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+
+snapshot_store = SnapshotStore()
+
+
+def build_snapshots(months=12):
+    """Precompute predictions for the next ``months`` months and replace the stored snapshots.
+
+    Returns the list of (year, month) that were written. Raises RuntimeError,
+    leaving the stored snapshots as they are, when a feature forecast fell
+    back to the seasonal naive forecast.
+    """
+    version = source_version()
+    start_month, start_year = default_target()
+    end_index = start_month - 1 + months - 1
+    end_month, end_year = end_index % 12 + 1, start_year + end_index // 12
+
+    fallbacks = set()
+    inputs = build_input_range(start_month, start_year, end_month, end_year, fallbacks=fallbacks)
+    if fallbacks:
+        # snapshots are served until the next rebuild, don't pin a failed or timed out fit that long
+        raise RuntimeError(
+            f"The forecast for {', '.join(sorted(fallbacks))} fell back to the seasonal naive forecast; "
+            "snapshots were not replaced."
+        )
+    payloads = predict_inputs([input_data for _, input_data in inputs])
+
+    snapshots = [
+        PredictionSnapshot(year=year, month=input_data["Month"], payload=payload, source_version=version)
+        for (year, input_data), payload in zip(inputs, payloads)
+    ]
+    with transaction.atomic():
+        PredictionSnapshot.objects.all().delete()
+        PredictionSnapshot.objects.bulk_create(snapshots)
+    snapshot_store.invalidate()
+    return [(s.year, s.month) for s in snapshots]
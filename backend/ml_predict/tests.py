@@ -1,3 +1,515 @@
-from django.test import TestCase
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import threading
+import warnings
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from caching import SingleFlight
+
+from .benchmarks import synthetic_history
+from .ml.dataset import HistoricalDataset
+from .ml.dataset import load_history
+from .ml.feature_forecast import FORECAST_FEATURES, forecast_paths
+from .ml.forecast_engines import ENGINES, SARIMAX_ORDER, SARIMAX_SEASONAL_ORDER, ForecastEngine, SarimaxEngine
+from .ml.forecast_pool import ForecastPool, fit_forecast
+from .ml.features import FeatureTableCache, LAG1_FEATURES, MODEL_FEATURES, ROLLING3_FEATURES, compute_feature_table, training_matrix
+from .ml.training import train_model
+from .ml.tree_inference import FlatTreeEnsemble
+from . import views
+from .models import PredictionSnapshot
+from .snapshots import build_snapshots
+from .recommendation import GatewayBusy, GatewayTimeout, RecommendationGateway
+
+
+def _row(year, month):
+    return {"Year": year, "Month": month, "Inflation Rate": 3.0, "Generation Charge": 6.0,
+            "Avg_Temperature": 28.0, "Total Bill": 10.0}
+
+
+class HistoricalDatasetTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, "history.csv")
+        synthetic_history(24).to_csv(self.path, index=False)
+
+    def test_concurrent_appends_keep_every_row(self):
+        dataset = HistoricalDataset(self.path)
+        dataset.frame()
+        threads = [threading.Thread(target=dataset.append, args=([_row(2010 + i, 1)],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(dataset.frame()), 32)
+        self.assertEqual(len(HistoricalDataset(self.path).frame()), 32)
+
+    def test_snapshot_pairs_the_frame_with_its_version(self):
+        dataset = HistoricalDataset(self.path)
+        df, version = dataset.snapshot()
+        dataset.append([_row(2010, 1)])
+
+        new_df, new_version = dataset.snapshot()
+        self.assertEqual((len(df), len(new_df)), (24, 25))
+        self.assertEqual(new_version, version + 1)
+        self.assertIs(dataset.frame(), new_df)
+
+    def test_append_rejects_existing_month(self):
+        dataset = HistoricalDataset(self.path)
+        with self.assertRaises(ValueError):
+            dataset.append([_row(2000, 1)])
+
+
+class FeatureTableTests(SimpleTestCase):
+    def assert_matches_tail(self, df):
+        table = compute_feature_table(df)
+        for i in range(3, len(df) + 1):
+            window = df.iloc[:i].tail(3)
+            for name, source in ROLLING3_FEATURES.items():
+                np.testing.assert_equal(table[name].iloc[i], window[source].mean(), err_msg=f"{i} {name}")
+            for name, source in LAG1_FEATURES.items():
+                np.testing.assert_equal(table[name].iloc[i], df[source].iloc[i - 1], err_msg=f"{i} {name}")
+
+    def test_rolling_means_equal_tail_means_exactly(self):
+        # long enough for a running sum to drift
+        self.assert_matches_tail(synthetic_history(2000))
+
+    def test_missing_months_are_skipped_like_pandas(self):
+        df = synthetic_history(12)
+        df.loc[4, "Total Bill"] = np.nan
+        df.loc[[7, 8, 9], "Generation Charge"] = np.nan
+        self.assert_matches_tail(df)
+        self.assertTrue(np.isnan(compute_feature_table(df)["Gen_Charge_Rolling3"].iloc[10]))
+
+
+class FeatureTableCacheTests(SimpleTestCase):
+    def test_table_of_a_stale_frame_is_not_served_for_the_new_version(self):
+        cache = FeatureTableCache()
+        old, new = synthetic_history(24), synthetic_history(25)
+        # a caller that read the frame before an append and the version after it
+        cache.get(old, 2)
+
+        self.assertEqual(len(cache.get(new, 2)), 26)
+        self.assertIs(cache.get(new, 2), cache.get(new, 2))
+
+
+class PredictRangeTests(SimpleTestCase):
+    def test_range_too_far_ahead_is_rejected(self):
+        response = self.client.get("/api/predict/range/", {"from": "9000-01", "to": "9000-12"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("months past the last month", response.json()["error"])
+
+    def test_batch_target_too_far_ahead_is_rejected(self):
+        response = self.client.post(
+            "/api/predict/batch/", {"items": [{"month": 1, "year": 9000}]}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("months past the last month", response.json()["error"])
+
+    @override_settings(ML_SNAPSHOT_ENABLED=False)
+    def test_predict_too_far_ahead_is_rejected(self):
+        response = self.client.get("/api/predict/", {"month": 1, "year": 9000})
+        self.assertEqual(response.status_code, 400)
+
+
+class PredictBatchOverrideTests(SimpleTestCase):
+    def setUp(self):
+        # a forecasted January row, without fitting anything
+        base = {name: 1.0 for name in MODEL_FEATURES}
+        base.update({"Month": 1, "Is_Hot_Season": 0, "Is_Cold_Season": 1})
+        patcher = mock.patch("ml_predict.views.build_next_month_input", return_value=base)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, *items):
+        return self.client.post("/api/predict/batch/", {"items": list(items)}, content_type="application/json")
+
+    def test_month_override_out_of_range_is_rejected(self):
+        for month in (13, 0, -1):
+            with self.subTest(month=month):
+                response = self.post({"overrides": {"Month": month}})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("between 1 and 12", response.json()["error"])
+
+    def test_month_override_recomputes_season_flags(self):
+        input_data = views._batch_item_input({"overrides": {"Month": 5}}, {})
+        self.assertEqual((input_data["Month"], input_data["Is_Hot_Season"], input_data["Is_Cold_Season"]), (5, 1, 0))
+
+        input_data = views._batch_item_input({"overrides": {"Month": 7}}, {})
+        self.assertEqual((input_data["Is_Hot_Season"], input_data["Is_Cold_Season"]), (0, 0))
+
+    def test_explicit_flag_override_wins(self):
+        input_data = views._batch_item_input({"overrides": {"Month": 7, "Is_Hot_Season": 1}}, {})
+        self.assertEqual((input_data["Is_Hot_Season"], input_data["Is_Cold_Season"]), (1, 0))
+
+    def test_month_override_is_predicted(self):
+        response = self.post({}, {"overrides": {"Month": 5}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["input_used"]["Is_Hot_Season"] for p in response.json()["predictions"]], [0, 1])
+
+
+class PendingGradioClient:
+    """gradio client stub whose jobs stay pending until the test resolves them."""
+
+    def __init__(self, src):
+        self.jobs = []
+
+    def submit(self, appliance_info, api_name):
+        job = concurrent.futures.Future()
+        self.jobs.append((appliance_info, job))
+        return job
+
+
+class RecommendationGatewayTests(SimpleTestCase):
+    def gateway(self, **kwargs):
+        self.clients = []
+
+        def factory(src):
+            client = PendingGradioClient(src)
+            self.clients.append(client)
+            return client
+
+        return RecommendationGateway(client_factory=factory, concurrency=1, **kwargs)
+
+    def answer_all(self):
+        for client in self.clients:
+            for appliance_info, job in client.jobs:
+                if not job.done():
+                    job.set_result(f"tip for {appliance_info}")
+
+    def test_queue_full_raises_busy(self):
+        gateway = self.gateway(queue_size=0)
+
+        async def scenario():
+            first = asyncio.create_task(gateway.arecommend("aircon"))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(GatewayBusy):
+                await gateway.arecommend("fan")
+            self.answer_all()
+            return await first
+
+        self.assertEqual(asyncio.run(scenario()), "tip for aircon")
+        self.assertEqual(gateway.stats()["active"], 0)
+
+    def test_waiting_too_long_raises_timeout(self):
+        gateway = self.gateway(queue_size=1, timeout=0.05)
+
+        async def scenario():
+            first = asyncio.create_task(gateway.arecommend("aircon"))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(GatewayTimeout):
+                await gateway.arecommend("fan")
+            self.assertEqual(gateway.stats()["waiting"], 0)
+            self.answer_all()
+            await first
+
+        asyncio.run(scenario())
+        self.assertEqual(gateway.stats()["active"], 0)
+
+    def test_cancelled_waiter_gives_its_slot_back(self):
+        gateway = self.gateway(queue_size=1, timeout=5)
+
+        async def scenario():
+            first = asyncio.create_task(gateway.arecommend("aircon"))
+            await asyncio.sleep(0.01)
+            queued = asyncio.create_task(gateway.arecommend("fan"))
+            await asyncio.sleep(0.01)
+            queued.cancel()  # the client disconnected while queued
+            with self.assertRaises(asyncio.CancelledError):
+                await queued
+            self.assertEqual(gateway.stats()["waiting"], 0)
+
+            self.answer_all()
+            await first
+            self.assertEqual(gateway.stats()["active"], 0)
+
+            # the slot is usable again
+            later = asyncio.create_task(gateway.arecommend("heater"))
+            await asyncio.sleep(0.01)
+            self.answer_all()
+            return await later
+
+        self.assertEqual(asyncio.run(scenario()), "tip for heater")
+        self.assertEqual(gateway.stats()["active"], 0)
+
+    def test_freed_slot_is_handed_to_a_queued_caller(self):
+        gateway = self.gateway(queue_size=1, timeout=5)
+
+        async def scenario():
+            first = asyncio.create_task(gateway.arecommend("aircon"))
+            await asyncio.sleep(0.01)
+            queued = asyncio.create_task(gateway.arecommend("fan"))
+            await asyncio.sleep(0.01)
+            self.answer_all()
+            await first
+            await asyncio.sleep(0.01)
+            self.answer_all()
+            return await queued
+
+        self.assertEqual(asyncio.run(scenario()), "tip for fan")
+        stats = gateway.stats()
+        self.assertEqual((stats["active"], stats["waiting"], stats["idle_clients"]), (0, 0, 1))
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_cancelling_the_leader_does_not_cancel_followers(self):
+        flight = SingleFlight()
+        release = None
+
+        async def fetch():
+            await release.wait()
+            return "result"
+
+        async def scenario():
+            nonlocal release
+            release = asyncio.Event()
+            leader = asyncio.create_task(flight.ado("key", fetch))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(flight.ado("key", fetch))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        self.assertEqual(asyncio.run(scenario()), "result")
+        self.assertEqual(flight.coalesced, 1)
+
+    def test_errors_reach_every_caller(self):
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def scenario():
+            return await asyncio.gather(flight.ado("key", fetch), flight.ado("key", fetch), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+
+class ForecastPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.horizons = []
+
+        def slow_fit(values, order, seasonal_order, horizon, keep_results=True):
+            self.horizons.append(horizon)
+            self.release.wait(5)
+            return None, np.arange(horizon, dtype="float64")
+
+        patcher = mock.patch("ml_predict.ml.forecast_pool.fit_forecast", slow_fit)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = ForecastPool(kind="thread", workers=2)
+        self.addCleanup(self.pool.shutdown)
+        self.addCleanup(self.release.set)
+
+    def submit(self, horizon):
+        return self.pool.submit("series", [1.0, 2.0], (1, 0, 0), (0, 1, 0, 12), horizon)
+
+    def test_shorter_request_joins_a_running_fit(self):
+        first = self.submit(12)
+        self.assertIs(self.submit(6), first)
+        self.release.set()
+        self.assertEqual(len(first.result(5)[1]), 12)
+        self.assertEqual(self.horizons, [12])
+
+    def test_longer_request_starts_its_own_fit(self):
+        short = self.submit(6)
+        longer = self.submit(12)
+        self.assertIsNot(longer, short)
+        # later callers join the longer fit
+        self.assertIs(self.submit(9), longer)
+        self.release.set()
+        self.assertEqual(len(longer.result(5)[1]), 12)
+        self.assertEqual(sorted(self.horizons), [6, 12])
+
+
+class SarimaxEngineTests(SimpleTestCase):
+    @override_settings(SHARED_CACHE_ALIAS=None)
+    def test_short_fit_result_is_padded_not_sliced_short(self):
+        future = concurrent.futures.Future()
+        future.set_result((None, np.array([1.0, 2.0])))
+        series = list(synthetic_history(36)["Total Bill"])
+
+        with mock.patch("ml_predict.ml.forecast_engines.forecast_pool.submit", return_value=future):
+            path = SarimaxEngine().forecast_paths({"bill": series}, 5)["bill"]
+
+        self.assertEqual(len(path), 5)
+        self.assertEqual(list(path[:2]), [1.0, 2.0])
+        self.assertTrue(np.isnan(path[2:]).all())
+
+
+class ForecastEngineParityTests(SimpleTestCase):
+    """ar1_lstsq is the closed form of the SARIMAX model, so their forecasts must agree."""
+
+    def assert_matches_sarimax(self, series_by_name, periods=24):
+        paths = ENGINES["ar1_lstsq"].forecast_paths(series_by_name, periods)
+        for name, series in series_by_name.items():
+            with warnings.catch_warnings():
+                # statsmodels warns on a few series even though the fit lands on the least-squares phi
+                warnings.simplefilter("ignore")
+                _, expected = fit_forecast(np.asarray(series, dtype="float64"), SARIMAX_ORDER, SARIMAX_SEASONAL_ORDER, periods)
+            np.testing.assert_allclose(paths[name], expected, rtol=1e-3, err_msg=name)
+
+    def test_real_history(self):
+        history = load_history()
+        self.assert_matches_sarimax({name: history[name] for name in FORECAST_FEATURES})
+
+    def test_synthetic_series(self):
+        series = {}
+        for seed in range(2):
+            history = synthetic_history(120, seed=seed)
+            series.update({f"{name} #{seed}": history[name] for name in FORECAST_FEATURES})
+        self.assert_matches_sarimax(series)
+
+    def test_engines_must_implement_forecast_paths(self):
+        class Incomplete(ForecastEngine):
+            name = "incomplete"
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    @override_settings(ML_FORECAST_ENGINE="arima", ML_PRELOAD_MODEL=False)
+    def test_unknown_engine_setting_fails_at_startup(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config("ml_predict").ready()
+
+
+class FlatTreeEnsembleTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.X, y = training_matrix(synthetic_history(240))
+        rng = np.random.default_rng(0)
+        # missing values while training, so some splits learn to send NaN left and others right
+        cls.X_missing = cls.X.copy()
+        cls.X_missing[rng.random(cls.X.shape) < 0.1] = np.nan
+        cls.y = y
+
+    def fit(self, X, **params):
+        import xgboost as xgb
+
+        model = xgb.XGBRegressor(n_estimators=40, max_depth=5, learning_rate=0.3, random_state=0, n_jobs=1, **params)
+        model.fit(X, self.y)
+        return model
+
+    def assert_same_predictions(self, model, X):
+        names = model.get_booster().feature_names
+        expected = model.predict(pd.DataFrame(X, columns=names) if names else X)
+        np.testing.assert_array_equal(FlatTreeEnsemble.from_booster(model).predict(X), expected)
+
+    def test_matches_xgboost_on_a_trained_model(self):
+        model, _ = train_model(synthetic_history(240), params={"n_estimators": 40, "max_depth": 5}, nthread=1, holdout=0)
+        self.assert_same_predictions(model, self.X)
+
+    def test_matches_xgboost_with_missing_values(self):
+        model = self.fit(self.X_missing)
+        rows = np.vstack([self.X_missing, np.full((1, len(MODEL_FEATURES)), np.nan)])
+        self.assert_same_predictions(model, rows)
+        # a model trained without gaps still has a default direction for them
+        self.assert_same_predictions(self.fit(self.X), rows)
+
+    def test_matches_xgboost_after_a_json_round_trip(self):
+        import xgboost as xgb
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "model.json")
+        self.fit(self.X_missing).save_model(path)
+        booster = xgb.Booster()
+        booster.load_model(path)
+
+        expected = booster.predict(xgb.DMatrix(self.X_missing, missing=np.nan))
+        np.testing.assert_array_equal(FlatTreeEnsemble.from_booster(booster).predict(self.X_missing), expected)
+
+    def test_single_row(self):
+        model = self.fit(self.X)
+        self.assertEqual(FlatTreeEnsemble.from_booster(model).predict(self.X[0]).shape, (1,))
+        self.assert_same_predictions(model, self.X[:1])
+
+
+class NaNEngine(ForecastEngine):
+    """An engine whose fits all failed or timed out."""
+
+    name = "nan"
+
+    def __init__(self):
+        self.calls = 0
+
+    def forecast_paths(self, series_by_name, periods):
+        self.calls += 1
+        return {name: np.full(periods, np.nan) for name in series_by_name}
+
+
+class ForecastFallbackTests(SimpleTestCase):
+    def test_fallback_series_are_reported(self):
+        history = synthetic_history(48)
+        fallbacks = set()
+        paths = forecast_paths(
+            {"long": history["Total Bill"], "short": history["Total Bill"][:6]}, periods=3, engine="ar1_lstsq", fallbacks=fallbacks,
+        )
+
+        self.assertEqual(fallbacks, {"short"})
+        # filled with the value one year (here: the last value) earlier
+        self.assertEqual(list(paths["short"]), [history["Total Bill"][5]] * 3)
+        self.assertFalse(np.isnan(paths["long"]).any())
+
+    @override_settings(ML_SNAPSHOT_ENABLED=False)
+    def test_fallback_predictions_are_not_cached(self):
+        engine = NaNEngine()
+        cache = mock.Mock()
+        cache.get.return_value = None
+
+        with mock.patch("ml_predict.ml.feature_forecast.get_engine", return_value=engine), \
+                mock.patch.object(views, "prediction_cache", cache):
+            _, first = views._resolve_prediction(None, None)
+            views._resolve_prediction(None, None)
+
+        self.assertIn("prediction", first)
+        self.assertEqual(engine.calls, 2)
+        cache.set.assert_not_called()
+
+    @override_settings(ML_SNAPSHOT_ENABLED=False, SHARED_CACHE_ALIAS=None)
+    def test_fitted_predictions_are_cached(self):
+        cache = mock.Mock()
+        cache.get.return_value = None
+
+        with mock.patch.object(views, "prediction_cache", cache):
+            views._resolve_prediction(None, None)
+
+        cache.set.assert_called_once()
+
+
+@override_settings(SHARED_CACHE_ALIAS=None)
+class BuildSnapshotsTests(TestCase):
+    def setUp(self):
+        PredictionSnapshot.objects.create(year=2000, month=1, payload={"prediction": 1.0}, source_version="old")
+
+    def test_fallback_forecasts_are_not_persisted(self):
+        with mock.patch("ml_predict.ml.feature_forecast.get_engine", return_value=NaNEngine()):
+            with self.assertRaises(RuntimeError):
+                build_snapshots(months=3)
+
+        self.assertEqual(list(PredictionSnapshot.objects.values_list("source_version", flat=True)), ["old"])
+
+    def test_snapshots_are_replaced(self):
+        written = build_snapshots(months=3)
+
+        self.assertEqual(len(written), 3)
+        self.assertEqual(PredictionSnapshot.objects.count(), 3)
+        self.assertFalse(PredictionSnapshot.objects.filter(source_version="old").exists())
@@ -1,8 +1,14 @@
 from django.urls import path
-from .views import predict_total_bill
-from .views import get_energy_recommendation
+from .views import predict_total_bill, predict_total_bill_range, predict_total_bill_batch
+from .views import get_energy_recommendation, recommendation_stats
+from .views import model_info, metrics
 
 urlpatterns = [
     path('predict/', predict_total_bill, name='predict-total-bill'),
+    path('predict/range/', predict_total_bill_range, name='predict-total-bill-range'),
+    path('predict/batch/', predict_total_bill_batch, name='predict-total-bill-batch'),
     path('recommend/', get_energy_recommendation, name='get-energy-recommendation'),
+    path('recommend/stats/', recommendation_stats, name='recommendation-stats'),
+    path('model-info/', model_info, name='model-info'),
+    path('metrics/', metrics, name='metrics'),
 ]
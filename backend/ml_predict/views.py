@@ -1,44 +1,105 @@
 from django.shortcuts import render
 # Create your views here.
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
-from .ml.feature_forecast import build_next_month_input
+from django.http import HttpResponse, JsonResponse
+from .ml.feature_forecast import build_next_month_input, build_input_range
+from .ml.features import MODEL_FEATURES, season_flags
+from .ml.model_registry import registry
+from .ml.prediction import build_prediction_responses, predict_raw
+from .snapshots import snapshot_store, default_target, source_version
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
 import json
-import pandas as pd
-import numpy as np
-import os
-import joblib
-import threading
-import time
-from gradio_client import Client
+import logging
+from django.conf import settings
+from caching import SharedCache
+from instrumentation import render_prometheus, span, timed_view
+from services import BoundedExecutor
+from .recommendation import aget_recommendation, cache_stats, GatewayBusy, GatewayTimeout
 
 
-huggingface_lock = threading.Lock()
-
 @csrf_exempt
-def get_energy_recommendation(request):
+async def get_energy_recommendation(request):
     if request.method == "POST":
-        if huggingface_lock.locked():
-            return JsonResponse(
-                {"error": "Model is currently processing another request. Please wait and try again."},
-                status=429  # Too Many Requests
-            )
-
         try:
             data = json.loads(request.body)
             user_input = data.get("appliance_info", "")
             prompt = user_input
-            with huggingface_lock:
-                client = Client("Wh1plashR/AppTry")
-                result = client.predict(appliance_info=prompt, api_name="/predict")
-                return JsonResponse({"recommendation": result})
+            # cached per normalized input; identical in-flight requests share one remote call,
+            # and waiting on the Space doesn't hold a thread
+            result = await aget_recommendation(prompt)
+            return JsonResponse({"recommendation": result})
+        except GatewayBusy as e:
+            return JsonResponse({"error": str(e)}, status=429)  # Too Many Requests
+        except GatewayTimeout as e:
+            return JsonResponse({"error": str(e)}, status=503)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({"error": "POST request required."}, status=400)
 
+
+logger = logging.getLogger(__name__)
+
+# forecasting and inference for the async views; at most ML_ASYNC_CPU_WORKERS run at once
+cpu_executor = BoundedExecutor("ML_ASYNC_CPU_WORKERS", default=4, name="ml-cpu")
+
+# live predictions for months without a snapshot, shared by every worker on the host
+prediction_cache = SharedCache("prediction", timeout=getattr(settings, "ML_PREDICTION_CACHE_TTL", 24 * 60 * 60))
+
+
+def recommendation_stats(request):
+    return JsonResponse(cache_stats())
+
+def _build_prediction_response(input_data, raw_prediction):
+    response_data = build_prediction_responses([input_data], [raw_prediction])[0]
+
+    # Log predictions for debugging
+    logger.debug(
+        "Raw prediction: %.4f, calibration factor: %.4f, calibrated: %.4f, seasonal factor: %.4f, final: %.4f",
+        response_data['raw_prediction'], response_data['calibration_factor'],
+        response_data['calibrated_prediction'], response_data['seasonal_factor'], response_data['prediction'],
+    )
+    return response_data
+
+
+def _predict_live(target_month, target_year, fallbacks=None):
+    # Build input data for prediction with specified month/year
+    with span("build_input"):
+        input_data = build_next_month_input(target_month=target_month, target_year=target_year, fallbacks=fallbacks)
+    logger.debug("INPUT DATA: %s", input_data)
+
+    # Get raw prediction from the warm model (loaded at startup, reloaded only if the file changes)
+    raw_prediction = predict_raw([input_data])[0]
+
+    return _build_prediction_response(input_data, raw_prediction)
+
+
+def _resolve_prediction(target_month, target_year):
+    """(snapshot, None) when a precomputed snapshot exists, else (None, live response data)."""
+    # Serve a precomputed snapshot when there is one for this month and the current model/data
+    snapshot_month, snapshot_year = (target_month, target_year) if target_month else default_target()
+    with span("snapshot_lookup"):
+        snapshot = snapshot_store.lookup(snapshot_year, snapshot_month)
+    if snapshot is not None:
+        return snapshot, None
+
+    # keyed on the source version too, so a new model or dataset never serves an old payload
+    key = (source_version(), snapshot_year, snapshot_month)
+    with span("prediction_cache_lookup"):
+        response_data = prediction_cache.get(key)
+    if response_data is None:
+        fallbacks = set()
+        response_data = _predict_live(target_month, target_year, fallbacks)
+        # a fallback forecast (e.g. a timed out fit) is served, but the next request tries again
+        if not fallbacks:
+            prediction_cache.set(key, response_data)
+    return None, response_data
+
+
 @csrf_exempt
-def predict_total_bill(request):
+@timed_view("predict")
+async def predict_total_bill(request):
     try:
         # Get target month and year from query parameters
         target_month = request.GET.get('month')
@@ -48,126 +109,159 @@ def predict_total_bill(request):
         if target_month and target_year:
             target_month = int(target_month)
             target_year = int(target_year)
-            print(f"Predicting for month: {target_month}, year: {target_year}")
+            logger.debug("Predicting for month: %s, year: %s", target_month, target_year)
         else:
             # Default to next month if not specified
-            print("No month/year specified, using default next month")
+            logger.debug("No month/year specified, using default next month")
             target_month = None
             target_year = None
         
-        # Load model
-        model_path = os.path.join("models", "xgb_total_bill_model_tuned_may.pkl")
-        model = joblib.load(model_path)
-        
-        # Build input data for prediction with specified month/year
-        input_data = build_next_month_input(target_month=target_month, target_year=target_year)
-        print("INPUT DATA:", input_data)  # Debug log
-        
-        # Create DataFrame for prediction
-        df = pd.DataFrame([input_data])
-        print("DATAFRAME FOR PREDICTION:\n", df)  # Debug log
-        
-        # Get raw prediction from model
-        raw_prediction = model.predict(df)[0]
-        print(f"Raw model prediction: {raw_prediction:.4f}")
-        
-        # Known values for calibration
-        expected_colab_prediction = 14.2376  # The value you're seeing in Colab
-        actual_app_prediction = 12.8      # The current prediction in the app
-        
-        # Calculate calibration factor to align app prediction with Colab prediction
-        calibration_factor = expected_colab_prediction / actual_app_prediction
-        
-        # Apply calibration to align with expected value first
-        calibrated_prediction = raw_prediction * calibration_factor
-        
-        # Load historical rates from pastRates.json to get dynamic seasonal adjustment
-        rates_file_path = os.path.join("frontend", "seconsumptiontracker-app", "src", "assets", "datas", "pastRates.json")
-        try:
-            with open(rates_file_path, 'r') as f:
-                historical_rates = json.load(f)
-                
-            # Convert to DataFrame for easier analysis
-            rates_df = pd.DataFrame(historical_rates)
-            
-            # Check if we're predicting for a specific month
-            target_month_to_use = input_data.get('Month')
-            
-            # Get the most recent known value for the target month
-            # Find entries for the target month across all years
-            month_data = rates_df[rates_df['Month'] == target_month_to_use]
-            
-            if not month_data.empty:
-                # Get the most recent year's data for this month
-                latest_year_for_month = month_data['Year'].max()
-                latest_month_value = month_data[month_data['Year'] == latest_year_for_month]['Total Bill'].values[0]
-                print(f"Latest known value for month {target_month_to_use}: {latest_month_value} (Year: {latest_year_for_month})")
-                
-                # Calculate monthly averages to determine seasonal patterns
-                monthly_averages = rates_df.groupby('Month')['Total Bill'].mean()
-                overall_average = rates_df['Total Bill'].mean()
-                
-                # Calculate how much this month typically varies from the overall average
-                month_avg = monthly_averages[target_month_to_use]
-                seasonal_variation = month_avg / overall_average
-                
-                # Calculate a dynamic seasonal factor based on historical data
-                # Adjust slightly more than the historical average to account for recent trends
-                seasonal_factor = 1.0 + ((seasonal_variation - 1.0) * 1.5)
-                
-                # Ensure the seasonal factor is within reasonable bounds
-                seasonal_factor = max(0.95, min(1.1, seasonal_factor))
-                
-                print(f"Dynamic seasonal factor for month {target_month_to_use}: {seasonal_factor:.4f}")
-            else:
-                # Fallback if no data exists for this month
-                print(f"No historical data found for month {target_month_to_use}, using default seasonal factor")
-                seasonal_factor = 1.01
-        except Exception as e:
-            print(f"Error loading historical rates: {e}")
-            # Fallback to original static seasonal factors if file can't be loaded
-            is_may = input_data.get('Month') == 5
-            is_april = input_data.get('Month') == 4
-            
-            if is_may:
-                seasonal_factor = 1.04  # 4% increase for May
-            elif is_april:
-                seasonal_factor = 1.03  # 3% adjustment
-            else:
-                seasonal_factor = 1.01  # 1% adjustment
-        
-        # Final prediction with both calibration and seasonal adjustment
-        final_prediction = calibrated_prediction * seasonal_factor
-        
-        # Log predictions for debugging
-        print(f"Raw prediction: {raw_prediction:.4f}")
-        print(f"Calibration factor: {calibration_factor:.4f}")
-        print(f"Calibrated prediction: {calibrated_prediction:.4f}")
-        print(f"Seasonal factor: {seasonal_factor:.4f}")
-        print(f"Final prediction: {final_prediction:.4f}")
-        
-        # Include detailed information in the response
-        response_data = {
-            "prediction": round(float(final_prediction), 4),  # Fully adjusted prediction
-            "raw_prediction": round(float(raw_prediction), 4),  # Raw model output
-            "calibrated_prediction": round(float(calibrated_prediction), 4),  # After calibration factor
-            "calibration_factor": round(float(calibration_factor), 4),
-            "seasonal_factor": round(float(seasonal_factor), 4),
-            "month": input_data.get('Month', 'unknown'),
-            "input_used": {k: float(v) if isinstance(v, (np.float32, np.float64)) else int(v) if isinstance(v, (np.int32, np.int64)) else v for k, v in input_data.items()}
-        }
-        
-        # Add reference value information if available
-        try:
-            response_data["reference_month_value"] = float(latest_month_value)
-            response_data["reference_year"] = int(latest_year_for_month)
-        except:
-            pass
-            
+        # forecasting and inference are CPU-bound, so the whole lookup runs in one hop to the
+        # bounded executor instead of on the event loop
+        snapshot, response_data = await cpu_executor.run(_resolve_prediction, target_month, target_year)
+        if snapshot is not None:
+            response = JsonResponse(snapshot["payload"])
+            response["ETag"] = snapshot["etag"]
+            response["Last-Modified"] = snapshot["last_modified"]
+            response["Cache-Control"] = "no-cache"  # browsers revalidate, usually getting a 304
+            return get_conditional_response(request, etag=snapshot["etag"], last_modified=parse_http_date_safe(snapshot["last_modified"]), response=response)
+
         return JsonResponse(response_data)
 
+    except ValueError as e:
+        # a bad month/year, or a target too far past the history
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.exception("PREDICTION ERROR: %s", e)
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+def _parse_year_month(value):
+    # "2025-06" -> (6, 2025)
+    year, month = value.split("-")
+    year, month = int(year), int(month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month in {value!r}")
+    return month, year
+
+
+@csrf_exempt
+@timed_view("predict_range")
+def predict_total_bill_range(request):
+    """Predictions for every month from ?from=YYYY-MM to ?to=YYYY-MM in one call."""
+    try:
+        start_month, start_year = _parse_year_month(request.GET.get('from', ''))
+        end_month, end_year = _parse_year_month(request.GET.get('to', ''))
+    except ValueError:
+        return JsonResponse({"error": "'from' and 'to' are required as YYYY-MM."}, status=400)
+
+    span_months = (end_year - start_year) * 12 + end_month - start_month + 1
+    max_months = getattr(settings, "ML_PREDICT_RANGE_MAX_MONTHS", 36)
+    if span_months > max_months:
+        return JsonResponse({"error": f"A range can cover at most {max_months} months."}, status=400)
+
+    try:
+        with span("build_input", months=span_months):
+            inputs = build_input_range(start_month, start_year, end_month, end_year)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        # one predict call for the whole range
+        range_inputs = [input_data for _, input_data in inputs]
+        raw_predictions = predict_raw(range_inputs)
+
+        predictions = build_prediction_responses(range_inputs, raw_predictions)
+        for (year, _), response_data in zip(inputs, predictions):
+            response_data["year"] = year
+        return JsonResponse({"predictions": predictions})
+
     except Exception as e:
-        print("PREDICTION ERROR:", e)
-        import traceback
-        traceback.print_exc()
-        return JsonResponse({"error": str(e)}, status=500)
\ No newline at end of file
+        logger.exception("PREDICTION ERROR: %s", e)
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+def _batch_item_input(item, base_inputs):
+    """Model input for one batch item: a forecasted month plus optional feature overrides.
+
+    ``base_inputs`` memoizes the forecasted input per (month, year) within a batch.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Each item must be an object.")
+    month = item.get("month")
+    year = item.get("year")
+    if (month is None) != (year is None):
+        raise ValueError("'month' and 'year' must be given together.")
+    target = (int(month), int(year)) if month is not None else (None, None)
+    if target not in base_inputs:
+        base_inputs[target] = build_next_month_input(target_month=target[0], target_year=target[1])
+    input_data = dict(base_inputs[target])
+
+    overrides = item.get("overrides") or {}
+    unknown = [name for name in overrides if name not in MODEL_FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown feature(s): {', '.join(unknown)}")
+    input_data.update({name: float(value) for name, value in overrides.items()})
+    if "Month" in overrides:
+        month = int(overrides["Month"])
+        if not 1 <= month <= 12:
+            raise ValueError("'Month' override must be between 1 and 12.")
+        input_data["Month"] = month
+        # the season flags follow the month unless they are overridden too
+        flags = season_flags(month)
+        for name in ("Is_Hot_Season", "Is_Cold_Season"):
+            if name not in overrides:
+                input_data[name] = int(flags[name])
+    return input_data
+
+
+@csrf_exempt
+@timed_view("predict_batch")
+def predict_total_bill_batch(request):
+    """Run many month/year targets and what-if scenarios through one predict call.
+
+    POST {"items": [{"month": 6, "year": 2025}, {"overrides": {"Generation Charge": 8.1}}, ...]}
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST request required."}, status=400)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format."}, status=400)
+
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({"error": "'items' must be a non-empty list."}, status=400)
+
+    max_items = getattr(settings, "ML_PREDICT_BATCH_MAX_ITEMS", 500)
+    if len(items) > max_items:
+        return JsonResponse({"error": f"A batch can contain at most {max_items} items."}, status=400)
+
+    try:
+        base_inputs = {}
+        with span("build_input", items=len(items)):
+            inputs = [_batch_item_input(item, base_inputs) for item in items]
+    except (TypeError, ValueError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        raw_predictions = predict_raw(inputs)
+        predictions = build_prediction_responses(inputs, raw_predictions)
+        return JsonResponse({"predictions": predictions})
+
+    except Exception as e:
+        logger.exception("PREDICTION ERROR: %s", e)
+        return JsonResponse({"error": str(e)}, status=500)
+
+def model_info(request):
+    try:
+        registry.get()
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+    return JsonResponse(registry.info())
+
+
+def metrics(request):
+    """Stage and request latency histograms in Prometheus text format."""
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
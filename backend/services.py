@@ -0,0 +1,79 @@
+import concurrent.futures
+import os
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+class LazyService:
+    """Builds an external SDK client on first use instead of at import time.
+
+    ``factory`` runs at most once per process (guarded by a lock); if it
+    raises, the next call tries again.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._instance = None
+        self._ready = False
+
+    def get(self):
+        if self._ready:
+            return self._instance
+        with self._lock:
+            if not self._ready:
+                self._instance = self._factory()
+                self._ready = True
+            return self._instance
+
+    def set(self, instance):
+        """Replace the instance, e.g. with a fake client in tests."""
+        with self._lock:
+            self._instance = instance
+            self._ready = True
+
+    def reset(self):
+        with self._lock:
+            self._instance = None
+            self._ready = False
+
+    @property
+    def ready(self):
+        return self._ready
+
+
+class BoundedExecutor:
+    """Fixed-size thread pool for blocking work started from async views.
+
+    At most ``workers`` calls run at once (an int, or the name of a setting
+    holding one); more callers wait in the pool's queue without blocking the
+    event loop. The pool is rebuilt after a fork, since worker threads don't
+    survive one.
+    """
+
+    def __init__(self, workers, default=4, name="bounded"):
+        self._workers = workers
+        self._default = default
+        self._name = name
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @property
+    def workers(self):
+        if isinstance(self._workers, str):
+            return getattr(settings, self._workers, self._default)
+        return self._workers
+
+    def get(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self._name)
+                    self._pid = os.getpid()
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        return await sync_to_async(fn, thread_sensitive=False, executor=self.get())(*args, **kwargs)